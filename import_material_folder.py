@@ -1,7 +1,29 @@
-
 # -------------------------------------------------------------
 # Material Folder Importer
 # -------------------------------------------------------------
+# Version 0.5
+# - Single pass keyword matching
+# - Materials of nested folders are prefixed with their categories
+# - Keyword profile is parsed once and cached
+# - Single pass folder scanning with os.scandir
+# - Nested material libraries with depth and folder filters
+# - Incremental import of changed folders only
+# - Image lookup through a path index
+# - Node registry instead of node tree scans
+# - Optional shared node groups for materials
+# - Existing materials are updated in place
+# - Previews are created after the import, spread over timer ticks
+# - Bugfix: Thumbnail textures were never used as preview
+# - Texture headers are validated in background threads
+# - Identical textures in different folders share one image
+# - Command line entry point for background mode
+# - Optional timing report of the import phases
+# - Dry run showing the keyword matches, cached for the import
+# - UDIM tile sets are imported as one tiled image
+# - Packed ORM/ARM/MRA maps through one image and a separate color node
+# - Optional deferred image loading
+# - Library watcher reimporting changed material folders
+# - Asset catalogs from the folder structure
 # Version 0.41
 # - Added lower/uppercase ignore
 # Version 0.4
@@ -11,7 +33,7 @@
 bl_info = {
     "name": "Material Folder Importer",
     "author": "Oliver Reischl <clawjelly@gmail.net>",
-    "version": (0, 41),
+    "version": (0, 5),
     "blender": (3, 00, 0),
     # "location": "View3D > Add > Mesh > New Object",
     "description": "Adds some more functionality to the Asset Browser",
@@ -19,8 +41,27 @@ bl_info = {
     "category": "Assets",
 }
 
+import argparse
+import csv
+import hashlib
 import json
+import os
+import re
+import struct
+import subprocess
+import sys
+import time
+import uuid
+import zlib
 import bpy
+from bpy.app.handlers import persistent
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from fnmatch import fnmatch
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from bpy_extras.io_utils import unique_name, ExportHelper, ImportHelper
 from bpy.props import (
@@ -35,6 +76,982 @@ from bpy.types import PropertyGroup, AddonPreferences
 
 # file_types = [".jpg", ".png", ".tga"]
 
+class TextureKeywordMatcher:
+    """Classifies texture filenames by their keywords in a single pass.
+
+    All keywords of all map types are compiled into one regex alternation,
+    so each filename is scanned once instead of once per keyword. If more
+    than one keyword matches, the longest keyword wins. On equal length
+    the map type listed first in tex_keywords wins.
+    """
+
+    def __init__(self, tex_keywords, ignore_case=False):
+        self.ignore_case = ignore_case
+        self.map_types = dict()
+        self.priority = dict()
+        for rank, (tkey, tids) in enumerate(tex_keywords.items()):
+            for tid in tids:
+                if ignore_case:
+                    tid = tid.casefold()
+                if tid=="" or tid in self.map_types:
+                    continue
+                self.map_types[tid] = tkey
+                self.priority[tid] = (-len(tid), rank)
+
+        # The lookahead makes every position a match candidate, so overlapping
+        # keywords are all found. Longer keywords are tried first.
+        keywords = sorted(self.map_types, key=len, reverse=True)
+        if keywords:
+            self.pattern = re.compile("(?=(" + "|".join(re.escape(k) for k in keywords) + "))")
+        else:
+            self.pattern = None
+
+    def match(self, stem):
+        """Returns a (map type, keyword) tuple for a filename stem or None."""
+        if self.pattern is None:
+            return None
+        if self.ignore_case:
+            stem = stem.casefold()
+        best = None
+        for hit in self.pattern.finditer(stem):
+            keyword = hit.group(1)
+            if best is None or self.priority[keyword] < self.priority[best]:
+                best = keyword
+        if best is None:
+            return None
+        return self.map_types[best], best
+
+    def classify(self, stem):
+        """Returns the map type for a filename stem or None."""
+        hit = self.match(stem)
+        return hit[0] if hit else None
+
+# map type -> addon preference holding its keywords
+KEYWORD_PREFS = (
+    ("ao",          "ao_keys"),
+    ("diffuse",     "diffuse_keys"),
+    ("reflection",  "reflection_keys"),
+    ("roughness",   "roughness_keys"),
+    ("metal",       "metal_keys"),
+    ("emission",    "emission_keys"),
+    ("normal",      "normal_keys"),
+    ("height",      "height_keys"),
+    ("orm",         "orm_keys"),
+    ("mra",         "mra_keys"),
+    ("render",      "thumbnail_keys"),
+    )
+
+DEFAULT_FILE_TYPES = "jpg, png, tga, tif, tiff"
+
+# map type -> default keywords
+DEFAULT_KEYWORDS = {
+    "ao":           "_ao, _AO, ambientocclusion, AmbientOcclusion, ambientOcclusion",
+    "diffuse":      "_diffuse, basemap, albedo, Albedo, _alb",
+    "reflection":   "_reflection, _ref, Reflection",
+    "roughness":    "roughness, _rgh, Roughness",
+    "metal":        "_met, metalness, Metalness",
+    "emission":     "_emi, Emission, emissive",
+    "normal":       "_nrm, _normal, NormalMap, normalmap",
+    "height":       "_height, HeightMap, heightmap",
+    "orm":          "_orm, _ORM, _arm, _ARM",
+    "mra":          "_mra, _MRA",
+    "render":       "_render, thumbnail, Thumbnail",
+    }
+
+@dataclass(frozen=True)
+class KeywordProfile:
+    """The parsed filetype and keyword configuration of the importer.
+    Immutable and hashable, so it can be used as a cache key.
+    """
+    file_types: frozenset
+    keywords: tuple
+    ignore_case: bool = False
+
+    def as_dict(self):
+        return {tkey: list(tids) for tkey, tids in self.keywords}
+
+    @property
+    def digest(self):
+        """A hash of the profile that is stable between Blender sessions."""
+        data = json.dumps([sorted(self.file_types), self.keywords, self.ignore_case])
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+    @property
+    def matcher(self):
+        return get_keyword_matcher(self)
+
+@lru_cache(maxsize=8)
+def parse_keyword_profile(file_types, ignore_case, *keyword_strings):
+    """Parses the preference strings into a KeywordProfile.
+    Memoized on the raw strings, so unchanged prefs are parsed only once.
+    """
+    suffixes = frozenset(f".{key.strip()}" for key in file_types.split(",") if key.strip()!="")
+    keywords = tuple(
+        (tkey, tuple(key.strip() for key in keys.strip().split(",") if key.strip()!=""))
+        for (tkey, _), keys in zip(KEYWORD_PREFS, keyword_strings))
+    return KeywordProfile(suffixes, keywords, ignore_case)
+
+@lru_cache(maxsize=8)
+def get_keyword_matcher(profile):
+    return TextureKeywordMatcher(profile.as_dict(), ignore_case=profile.ignore_case)
+
+def get_keyword_profile(addon_prefs):
+    """Returns the keyword profile for the current addon preferences."""
+    return parse_keyword_profile(
+        addon_prefs.file_types,
+        addon_prefs.ignore_case,
+        *(getattr(addon_prefs, attr) for _, attr in KEYWORD_PREFS))
+
+def load_keyword_profile(filepath):
+    """ Returns the keyword profile of a json file as written by "Save Keywords".
+    Missing entries use the defaults. The file may also contain
+    "file_types" and "ignore_case".
+    """
+    with open(filepath) as jsonfile:
+        tex_keywords = json.load(jsonfile)
+    return parse_keyword_profile(
+        tex_keywords.get("file_types", DEFAULT_FILE_TYPES),
+        bool(tex_keywords.get("ignore_case", False)),
+        *(tex_keywords.get(tkey, DEFAULT_KEYWORDS[tkey]) for tkey, _ in KEYWORD_PREFS))
+
+def default_keyword_profile():
+    return parse_keyword_profile(DEFAULT_FILE_TYPES, False, *(DEFAULT_KEYWORDS[tkey] for tkey, _ in KEYWORD_PREFS))
+
+def clear_keyword_profile_cache():
+    parse_keyword_profile.cache_clear()
+    get_keyword_matcher.cache_clear()
+
+class ImportProfiler:
+    """ Measures where an import spends its time. Phases are timed with
+    perf_counter_ns spans, nested spans are subtracted from their parent,
+    so every phase only counts its own time. Disabled spans cost a single
+    attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.totals = dict()
+        self.calls = dict()
+        self.materials = []
+        self.stack = []
+        self.start_ns = time.perf_counter_ns()
+        self.wall_ns = 0
+
+    def start(self):
+        self.reset()
+        self.enabled = True
+
+    def stop(self):
+        self.wall_ns = time.perf_counter_ns() - self.start_ns
+        self.enabled = False
+
+    @contextmanager
+    def span(self, phase):
+        if not self.enabled:
+            yield
+            return
+        frame = [time.perf_counter_ns(), 0]
+        self.stack.append(frame)
+        try:
+            yield
+        finally:
+            self.stack.pop()
+            elapsed = time.perf_counter_ns() - frame[0]
+            self.totals[phase] = self.totals.get(phase, 0) + elapsed - frame[1]
+            self.calls[phase] = self.calls.get(phase, 0) + 1
+            if self.stack:
+                self.stack[-1][1] += elapsed
+
+    def add_material(self, name, duration_ns, size):
+        if self.enabled:
+            self.materials.append((name, duration_ns, size))
+
+    def summary(self):
+        seconds = self.wall_ns / 1e9 or 1e-9
+        size = sum(item[2] for item in self.materials)
+        text = f"{len(self.materials)} materials in {seconds:.2f}s ({len(self.materials)/seconds:.1f} mat/s, {size/seconds/1e6:.1f} MB/s)"
+        if self.totals:
+            phase, total = max(self.totals.items(), key=lambda item: item[1])
+            text += f", most time in {phase}: {total/1e9:.2f}s"
+        return text
+
+    def write_report(self, directory, name="import"):
+        """Writes the phase timings as json and the material timings as csv. Returns the json path."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        seconds = self.wall_ns / 1e9 or 1e-9
+        size = sum(item[2] for item in self.materials)
+        report = {
+            "name": name,
+            "wall_seconds": seconds,
+            "materials": len(self.materials),
+            "megabytes": size / 1e6,
+            "materials_per_second": len(self.materials) / seconds,
+            "megabytes_per_second": size / seconds / 1e6,
+            "phases": {
+                phase: {"seconds": total / 1e9, "calls": self.calls[phase]}
+                for phase, total in sorted(self.totals.items(), key=lambda item: -item[1])},
+            "other_seconds": (self.wall_ns - sum(self.totals.values())) / 1e9,
+            }
+        json_path = directory / f"{name}_{stamp}.json"
+        with open(json_path, "w") as jsonfile:
+            json.dump(report, jsonfile, indent=2)
+        with open(directory / f"{name}_{stamp}.csv", "w", newline="") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["material", "milliseconds", "bytes"])
+            for mat_name, duration_ns, mat_size in self.materials:
+                writer.writerow([mat_name, f"{duration_ns/1e6:.3f}", mat_size])
+        return json_path
+
+import_profiler = ImportProfiler()
+
+# One material folder found in the library. textures is a {map type: path} dict,
+# category the tuple of parent folder names below the library root and signature
+# a tuple of (filename, size, mtime) of all texture files, if requested.
+# info is a {map type: TextureInfo} dict, if the textures were validated.
+MaterialRecord = namedtuple("MaterialRecord", "name textures path category signature info", defaults=((), None, None))
+
+def material_name(folder_name, category=()):
+    """ Returns the material name of a folder. Nested folders are prefixed
+    with their categories, so Wood/Oak and Metal/Oak don't collide.
+    """
+    return " ".join(category + (Path(folder_name).stem,)).replace("_", " ")
+
+def split_list(value):
+    """Splits a comma-seperated preference string into a tuple."""
+    return tuple(item.strip() for item in value.split(",") if item.strip()!="")
+
+def matches_any(name, relpath, patterns):
+    """Checks a folder name or its path relative to the root against glob patterns."""
+    return any(fnmatch(name, pattern) or fnmatch(relpath, pattern) for pattern in patterns)
+
+def list_folder(path):
+    """Lists a folder once. Returns lists of DirEntry objects for files and folders sorted by name."""
+    files, folders = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                folders.append(entry)
+            elif entry.is_file():
+                files.append(entry)
+    files.sort(key=lambda entry: entry.name)
+    folders.sort(key=lambda entry: entry.name)
+    return files, folders
+
+def folder_signature(files, profile):
+    """Returns a (filename, size, mtime) tuple for every texture file of a folder.
+    On Windows DirEntry.stat() is served from the directory listing.
+    """
+    signature = []
+    for entry in files:
+        if os.path.splitext(entry.name)[1] not in profile.file_types:
+            continue
+        stat = entry.stat()
+        signature.append((entry.name, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+# Tile number at the end of a filename stem, e.g. albedo.1001 or albedo_1012
+UDIM_PATTERN = re.compile(r"^(.*[._])(1\d{3})$")
+UDIM_TOKEN = "<UDIM>"
+
+def texture_entries(files, profile):
+    """ Returns a (filename, stem, path) tuple for every texture file of a
+    folder listing. UDIM tile sets like albedo.1001.png ... albedo.1012.png
+    are grouped into one albedo.<UDIM>.png entry in the same pass, so a set
+    is classified and loaded once. A single numbered file stays as it is.
+    """
+    entries = []
+    # token name -> (index in entries, stem without tile number, tiles)
+    groups = dict()
+    for entry in files:
+        stem, suffix = os.path.splitext(entry.name)
+        if suffix not in profile.file_types:
+            continue
+        hit = UDIM_PATTERN.match(stem)
+        if hit is None:
+            entries.append((entry.name, stem, entry.path))
+            continue
+        name = f"{hit.group(1)}{UDIM_TOKEN}{suffix}"
+        if name not in groups:
+            groups[name] = (len(entries), hit.group(1).rstrip("._"), [])
+            entries.append((entry.name, stem, entry.path))
+        groups[name][2].append(entry)
+    for name, (index, stem, tiles) in groups.items():
+        if len(tiles)>1:
+            entries[index] = (name, stem, os.path.join(os.path.dirname(tiles[0].path), name))
+    return entries
+
+def udim_tiles(tpath):
+    """Returns the (tile number, path) of all tiles of a <UDIM> texture path, sorted by number."""
+    tpath = Path(tpath)
+    prefix, suffix = tpath.name.split(UDIM_TOKEN)
+    tiles = []
+    try:
+        with os.scandir(tpath.parent) as entries:
+            for entry in entries:
+                number = entry.name[len(prefix):len(entry.name)-len(suffix)]
+                if entry.name.startswith(prefix) and entry.name.endswith(suffix) and len(number)==4 and number.isdigit():
+                    tiles.append((int(number), Path(entry.path)))
+    except OSError:
+        pass
+    tiles.sort()
+    return tiles
+
+def texture_size(tpath):
+    """Size of a texture file in bytes, of all tiles for a UDIM set."""
+    if UDIM_TOKEN in str(tpath):
+        return sum(os.path.getsize(tile) for _, tile in udim_tiles(tpath))
+    return os.path.getsize(tpath)
+
+def classify_texture_files(files, profile):
+    """ Searches the names of all files for texture keywords
+    Returns a dict of texture paths. If several files match the same
+    map type, the first one in alphabetical order is used.
+    """
+    matcher = profile.matcher
+    tfiles = dict()
+    for _, stem, path in texture_entries(files, profile):
+        tkey = matcher.classify(stem)
+        if tkey and tkey not in tfiles:
+            tfiles[tkey]=Path(path)
+    return tfiles
+
+# Keyword matches of one folder. matches is a {map type: (filename, keyword)} dict,
+# conflicts holds (map type, filename, keyword) of files that lost against an
+# earlier file of the same map type, unclassified the texture files without keyword.
+FolderExplanation = namedtuple("FolderExplanation", "matches conflicts unclassified")
+
+def explain_texture_files(files, profile):
+    """ Same as classify_texture_files, but keeps the matched keywords,
+    the files that lost a conflict and the files without any keyword.
+    """
+    matcher = profile.matcher
+    matches = dict()
+    conflicts = []
+    unclassified = []
+    for name, stem, _ in texture_entries(files, profile):
+        hit = matcher.match(stem)
+        if hit is None:
+            unclassified.append(name)
+        elif hit[0] in matches:
+            conflicts.append((hit[0], name, hit[1]))
+        else:
+            matches[hit[0]] = (name, hit[1])
+    return FolderExplanation(matches, tuple(conflicts), tuple(unclassified))
+
+class ClassificationCache:
+    """ Keyword matches of every folder of a library, keyed by the names of
+    its texture files. Matching only depends on the filenames, so a folder
+    whose listing didn't change is not matched again. All entries are
+    dropped when the keyword profile changes.
+    Stored in the user config folder, one file per library.
+    """
+
+    def __init__(self, root, profile):
+        root_hash = hashlib.blake2b(str(root).encode("utf-8"), digest_size=8).hexdigest()
+        self.path = Path(bpy.utils.resource_path(type="USER")) / "config" / "material_import_classification" / f"{root_hash}.json"
+        self.profile = profile
+        self.entries = dict()
+        # relpath -> FolderExplanation of all folders seen in this run
+        self.visited = dict()
+        self.changed = False
+
+    def load(self):
+        try:
+            with open(self.path, "r") as jsonfile:
+                data = json.load(jsonfile)
+        except (OSError, ValueError):
+            return
+        if data.get("profile")==self.profile.digest:
+            self.entries = data.get("folders", dict())
+
+    def save(self):
+        if not self.changed:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # shards scan the same library, so never leave a half written file
+        tmp_path = self.path.with_name(f"{self.path.stem}_{os.getpid()}.tmp")
+        with open(tmp_path, "w") as jsonfile:
+            json.dump({"profile": self.profile.digest, "folders": self.entries}, jsonfile, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+        self.changed = False
+
+    def explain(self, relpath, files):
+        """Returns the FolderExplanation of a folder, from the cache if its texture files didn't change."""
+        names = [entry.name for entry in files if os.path.splitext(entry.name)[1] in self.profile.file_types]
+        if not names:
+            return FolderExplanation(dict(), (), ())
+        key = hashlib.blake2b("\0".join(names).encode("utf-8"), digest_size=8).hexdigest()
+        entry = self.entries.get(relpath)
+        if entry and entry["key"]==key:
+            explanation = FolderExplanation(
+                {tkey: tuple(match) for tkey, match in entry["matches"].items()},
+                tuple(tuple(conflict) for conflict in entry["conflicts"]),
+                tuple(entry["unclassified"]))
+        else:
+            explanation = explain_texture_files(files, self.profile)
+            self.entries[relpath] = {"key": key, **explanation._asdict()}
+            self.changed = True
+        self.visited[relpath] = explanation
+        return explanation
+
+def scan_texture_files(path, profile):
+    """ Searches the names of all files in a folder for texture keywords
+    Uses os.scandir, so the file type comes from the directory listing
+    and no extra stat call is needed per file.
+    """
+    files, _ = list_folder(path)
+    return classify_texture_files(files, profile)
+
+def scan_material_library(root, profile, max_depth=1, include=(), exclude=(), with_signature=False, cache=None, shard=None):
+    """ Walks a material library and yields a MaterialRecord for every folder
+    containing textures. A folder with textures is a material, a folder
+    without is a category and will be searched further down.
+
+    max_depth: How many folder levels are searched, 1 only looks at direct subfolders, 0 is unlimited
+    include: Glob patterns, only material folders matching one of them are imported
+    exclude: Glob patterns, matching folders are skipped including everything below
+    with_signature: Adds the sizes and modification times of the texture files to the records
+    cache: A ClassificationCache, unchanged folders reuse their keyword matches
+    shard: An (index, count) tuple, top level folders of other shards are not listed
+
+    This is a generator, so materials can be built while scanning.
+    Every folder is listed exactly once.
+    """
+    def walk(folders, category, depth):
+        for folder in folders:
+            name = folder.name
+            relpath = "/".join(category + (name,))
+            if exclude and matches_any(name, relpath, exclude):
+                continue
+            if shard and depth==1 and not in_shard(name, shard):
+                continue
+            with import_profiler.span("scan"):
+                files, subfolders = list_folder(folder.path)
+            with import_profiler.span("match"):
+                if cache is not None:
+                    matches = cache.explain(relpath, files).matches
+                    tfiles = {tkey: Path(folder.path, filename) for tkey, (filename, _) in matches.items()}
+                else:
+                    tfiles = classify_texture_files(files, profile)
+            if len(tfiles)!=0:
+                if include and not matches_any(name, relpath, include):
+                    continue
+                with import_profiler.span("scan"):
+                    signature = folder_signature(files, profile) if with_signature else None
+                yield MaterialRecord(material_name(name, category), tfiles, Path(folder.path), category, signature)
+            elif subfolders and (max_depth==0 or depth<max_depth):
+                yield from walk(subfolders, category + (name,), depth+1)
+
+    with import_profiler.span("scan"):
+        _, folders = list_folder(root)
+    yield from walk(folders, (), 1)
+
+# Header data of a texture file. error is a message if the file can't be used.
+TextureInfo = namedtuple("TextureInfo", "width height channels bit_depth error", defaults=(0, 0, 0, 0, None))
+
+# png color type -> channels
+PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+def read_png_header(f):
+    data = f.read(26)
+    if len(data)<26 or data[:8]!=b"\x89PNG\r\n\x1a\n" or data[12:16]!=b"IHDR":
+        return TextureInfo(error="not a valid png file")
+    width, height, bit_depth, color_type = struct.unpack(">IIBB", data[16:26])
+    return TextureInfo(width, height, PNG_CHANNELS.get(color_type, 0), bit_depth)
+
+def read_jpeg_header(f):
+    if f.read(2)!=b"\xff\xd8":
+        return TextureInfo(error="not a valid jpeg file")
+    while True:
+        marker = f.read(2)
+        if len(marker)<2 or marker[0]!=0xFF:
+            return TextureInfo(error="no jpeg frame header found")
+        if marker[1] in (0xD8, 0x01) or 0xD0<=marker[1]<=0xD7:
+            continue
+        length = f.read(2)
+        if len(length)<2:
+            return TextureInfo(error="truncated jpeg file")
+        length = struct.unpack(">H", length)[0]
+        # start of frame markers, except DHT, JPG and DAC
+        if 0xC0<=marker[1]<=0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+            data = f.read(6)
+            if len(data)<6:
+                return TextureInfo(error="truncated jpeg file")
+            bit_depth, height, width, channels = struct.unpack(">BHHB", data)
+            return TextureInfo(width, height, channels, bit_depth)
+        f.seek(length-2, os.SEEK_CUR)
+
+def read_tga_header(f):
+    data = f.read(18)
+    if len(data)<18:
+        return TextureInfo(error="truncated tga file")
+    image_type = data[2]
+    width, height, pixel_depth = struct.unpack("<HHB", data[12:17])
+    if image_type not in (1, 2, 3, 9, 10, 11):
+        return TextureInfo(error="no image data in tga file")
+    if image_type in (3, 11):
+        channels = 1
+    elif pixel_depth==32 or (pixel_depth==16 and data[17] & 0x0F):
+        channels = 4
+    else:
+        channels = 3
+    return TextureInfo(width, height, channels, 8)
+
+def read_tiff_header(f):
+    data = f.read(8)
+    if len(data)<8 or data[:2] not in (b"II", b"MM"):
+        return TextureInfo(error="not a valid tiff file")
+    order = "<" if data[:2]==b"II" else ">"
+    if struct.unpack(order+"H", data[2:4])[0]!=42:
+        return TextureInfo(error="unsupported tiff file")
+    f.seek(struct.unpack(order+"I", data[4:8])[0])
+    count = f.read(2)
+    if len(count)<2:
+        return TextureInfo(error="truncated tiff file")
+    tags = dict()
+    for _ in range(struct.unpack(order+"H", count)[0]):
+        entry = f.read(12)
+        if len(entry)<12:
+            return TextureInfo(error="truncated tiff file")
+        tag, ftype, fcount = struct.unpack(order+"HHI", entry[:8])
+        if ftype==3:
+            tags[tag] = struct.unpack(order+"H", entry[8:10])[0]
+        elif ftype==4:
+            tags[tag] = struct.unpack(order+"I", entry[8:12])[0]
+        if tag==258 and fcount>2 and ftype==3:
+            # bits per sample of several channels are stored elsewhere, they are all the same anyway
+            pos = f.tell()
+            f.seek(struct.unpack(order+"I", entry[8:12])[0])
+            tags[tag] = struct.unpack(order+"H", f.read(2))[0]
+            f.seek(pos)
+    if 256 not in tags or 257 not in tags:
+        return TextureInfo(error="no image size in tiff file")
+    return TextureInfo(tags[256], tags[257], tags.get(277, 1), tags.get(258, 1))
+
+# file suffix -> header reader
+HEADER_READERS = {
+    ".png": read_png_header,
+    ".jpg": read_jpeg_header,
+    ".jpeg": read_jpeg_header,
+    ".tga": read_tga_header,
+    ".tif": read_tiff_header,
+    ".tiff": read_tiff_header,
+    }
+
+def probe_texture(tpath):
+    """ Reads size, channels and bit depth of a texture from its header
+    without decoding any pixels. Safe to call from worker threads.
+    Returns a TextureInfo, with an error message for broken files.
+    """
+    if UDIM_TOKEN in str(tpath):
+        # the tiles of a set are expected to share their format, the first one is checked
+        tiles = udim_tiles(tpath)
+        if not tiles:
+            return TextureInfo(error="no udim tiles found")
+        tpath = tiles[0][1]
+    reader = HEADER_READERS.get(os.path.splitext(str(tpath))[1].lower())
+    try:
+        if os.path.getsize(tpath)==0:
+            return TextureInfo(error="empty file")
+        if reader is None:
+            return TextureInfo()
+        with open(tpath, "rb") as f:
+            info = reader(f)
+    except (OSError, struct.error) as e:
+        return TextureInfo(error=str(e))
+    if info.error is None and (info.width==0 or info.height==0):
+        return info._replace(error="image has no pixels")
+    return info
+
+def validate_records(records, workers=8, lookahead=32):
+    """ Reads the texture headers of each MaterialRecord in a thread pool
+    and yields the records with their info filled in.
+    Up to lookahead records are probed ahead, so the file access happens
+    while the main thread is busy building materials.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        window = deque()
+
+        def finish(record, futures):
+            with import_profiler.span("validate"):
+                return record._replace(info={tkey: future.result() for tkey, future in futures.items()})
+
+        for record in records:
+            futures = {tkey: pool.submit(probe_texture, tpath) for tkey, tpath in record.textures.items()}
+            window.append((record, futures))
+            if len(window)>=lookahead:
+                yield finish(*window.popleft())
+        while window:
+            yield finish(*window.popleft())
+
+def hash_file(path, chunk_size=1<<20):
+    """Hashes the content of a file with blake2b, reading it in chunks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class TextureDeduplicator:
+    """ Finds byte-identical textures across material folders, so they can
+    share one image datablock.
+
+    Only files with the same size as an earlier file are hashed, the
+    hashing runs in a thread pool. Hashes are stored in the user config
+    folder together with size and mtime, and are reused as long as the
+    file doesn't change.
+    """
+
+    def __init__(self, workers=8):
+        self.workers = workers
+        self.pool = None
+        self.by_size = dict()
+        self.hashes = dict()
+        self.duplicates = 0
+        self.cache_path = Path(bpy.utils.resource_path(type="USER")) / "config" / "material_import_hashes.json"
+
+    def __enter__(self):
+        self.load()
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *args):
+        self.pool.shutdown()
+        self.save()
+
+    def load(self):
+        try:
+            with open(self.cache_path) as jsonfile:
+                self.hashes = json.load(jsonfile)
+        except (OSError, ValueError):
+            self.hashes = dict()
+
+    def save(self):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_path, "w") as jsonfile:
+                json.dump(self.hashes, jsonfile)
+        except OSError:
+            print("Material importer: could not save the texture hash cache.")
+
+    def cached_hash(self, key, stat):
+        entry = self.hashes.get(key)
+        if entry and entry[0]==stat.st_size and entry[1]==stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def resolve(self, tfiles):
+        """ Returns the texture dict with every duplicate replaced by the
+        path of the first identical file seen during this import.
+        """
+        candidates = []
+        for tkey, tpath in tfiles.items():
+            try:
+                # UDIM sets have no single file and are never shared
+                stat = os.stat(tpath)
+            except OSError:
+                continue
+            key = normalize_path(tpath)
+            bucket = self.by_size.setdefault(stat.st_size, [])
+            candidates.append((tkey, tpath, key, stat, bucket))
+
+        # hash all files which share their size with another file, in parallel
+        jobs = dict()
+        for tkey, tpath, key, stat, bucket in candidates:
+            if len(bucket)==0 or any(entry[0]==key for entry in bucket):
+                continue
+            for entry in bucket + [[key, tpath, stat]]:
+                if entry[0] not in jobs and self.cached_hash(entry[0], entry[2]) is None:
+                    jobs[entry[0]] = (self.pool.submit(hash_file, entry[1]), entry[2])
+        for key, (future, stat) in jobs.items():
+            try:
+                self.hashes[key] = [stat.st_size, stat.st_mtime_ns, future.result()]
+            except OSError:
+                pass
+
+        result = dict(tfiles)
+        for tkey, tpath, key, stat, bucket in candidates:
+            own_hash = self.cached_hash(key, stat)
+            for other_key, other_path, other_stat in bucket:
+                if other_key==key:
+                    break
+                if own_hash and own_hash==self.cached_hash(other_key, other_stat):
+                    result[tkey] = other_path
+                    self.duplicates+=1
+                    break
+            else:
+                bucket.append([key, tpath, stat])
+        return result
+
+def texture_colorspace(tkey, info=None):
+    """Returns the colorspace a texture should use, or None to keep the default."""
+    # colored emission maps are colors, single channel ones are masks
+    if tkey=="emission" and info is not None and info.channels>=3:
+        return 'sRGB'
+    if tkey in NON_COLOR_MAPS:
+        return 'Non-Color'
+    return None
+
+def resolution_tag(infos):
+    """Returns a tag like "2K" for the largest texture of a material."""
+    size = max((max(info.width, info.height) for info in infos if info.error is None), default=0)
+    if size==0:
+        return ""
+    if size>=1024 and size%1024==0:
+        return f"{size//1024}K"
+    return f"{size}px"
+
+# importer settings which change the imported materials or their tags,
+# the folder depth decides the categories and validation drops broken textures
+MANIFEST_SETTINGS = (
+    "mark_asset", "convert_from_directx", "tag1", "tag2", "tag3", "category_tags",
+    "use_node_groups", "deduplicate_textures", "resolution_tags", "lazy_images",
+    "use_catalogs", "catalog_root", "catalog_mapping", "validate_textures",
+    "recursive", "max_depth",
+    )
+
+def import_settings_digest(settings):
+    """A hash of the importer settings that change the imported materials."""
+    data = json.dumps([getattr(settings, attr) for attr in MANIFEST_SETTINGS])
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+class ImportManifest:
+    """ Remembers which material folders were imported and which texture
+    files they contained, so unchanged folders can be skipped next time.
+
+    The manifest is stored in the library root. If that is not writeable
+    it goes into the blender user config folder instead.
+    """
+
+    FILENAME = ".material_import_manifest{}.json"
+
+    def __init__(self, root, profile, suffix="", settings_digest=""):
+        self.root = Path(root)
+        self.profile_digest = profile.digest
+        self.settings_digest = settings_digest
+        self.folders = dict()
+        self.seen = set()
+        self.skipped = 0
+        self.path = self.root / self.FILENAME.format(suffix)
+        root_hash = hashlib.blake2b(str(self.root.resolve()).encode("utf-8"), digest_size=8).hexdigest()
+        self.fallback_path = Path(bpy.utils.resource_path(type="USER")) / "config" / "material_import_manifests" / f"{root_hash}{suffix}.json"
+
+    def load(self):
+        for mpath in (self.path, self.fallback_path):
+            try:
+                with open(mpath) as jsonfile:
+                    data = json.load(jsonfile)
+            except (OSError, ValueError):
+                continue
+            # a different keyword profile classifies differently and different
+            # import settings build different materials, so everything is outdated
+            if data.get("profile")==self.profile_digest and data.get("settings", "")==self.settings_digest:
+                self.folders = data.get("folders", dict())
+            return
+
+    def save(self):
+        data = {"profile": self.profile_digest, "settings": self.settings_digest, "folders": self.folders}
+        for mpath in (self.path, self.fallback_path):
+            try:
+                mpath.parent.mkdir(parents=True, exist_ok=True)
+                with open(mpath, "w") as jsonfile:
+                    json.dump(data, jsonfile)
+                return True
+            except OSError:
+                continue
+        print("Material importer: could not save the import manifest.")
+        return False
+
+    def key(self, record):
+        return record.path.relative_to(self.root).as_posix()
+
+    def is_unchanged(self, record):
+        """Checks if a folder still has the same texture files as on the last import."""
+        key = self.key(record)
+        self.seen.add(key)
+        entry = self.folders.get(key)
+        if entry is None or record.signature is None:
+            return False
+        # entries of older versions used the folder name only
+        if entry.get("name")!=record.name or bpy.data.materials.get(entry["material"]) is None:
+            return False
+        if [list(item) for item in record.signature]!=entry["files"]:
+            return False
+        self.skipped+=1
+        return True
+
+    def changed(self, records):
+        """Yields the records of changed folders, unchanged ones are counted in skipped."""
+        for record in records:
+            with import_profiler.span("manifest"):
+                unchanged = self.is_unchanged(record)
+            if not unchanged:
+                yield record
+
+    def update(self, record, material_name):
+        key = self.key(record)
+        self.seen.add(key)
+        self.folders[key] = {
+            "name": record.name,
+            "material": material_name,
+            "files": [list(item) for item in record.signature or ()],
+            }
+
+    def pop_removed(self):
+        """Removes folders which don't exist anymore. Returns their material names."""
+        removed = []
+        for key in list(self.folders):
+            if key in self.seen or (self.root / key).is_dir():
+                continue
+            removed.append(self.folders.pop(key)["material"])
+        return removed
+
+class AssetCatalogs:
+    """ Reads and extends a blender_assets.cats.txt catalog definition file.
+    New catalogs are collected during the import and written in one go by
+    save(), existing catalogs keep their ids. New ids are uuid5 of the
+    catalog path, so every import of the same folder gets the same id.
+
+    Shards of a command line import write the same file at the same time,
+    so save() locks it and merges with the current content.
+    """
+
+    FILENAME = "blender_assets.cats.txt"
+    LOCK_TIMEOUT = 10.0     # seconds to wait for another process to save
+    LOCK_STALE = 60.0       # lock files older than this are left over from a crash
+    NAMESPACE = uuid.UUID("5d0b9e0a-6e3c-4f0e-9a51-3c2b1e7d8f40")
+    HEADER = (
+        "# This is an Asset Catalog Definition file for Blender.\n"
+        "#\n"
+        "# Empty lines and lines starting with `#` will be ignored.\n"
+        "# The first non-ignored line should be the version indicator.\n"
+        "# Other lines are of the format \"UUID:catalog/path/for/assets:simple catalog name\"\n"
+        "\n"
+        "VERSION 1\n"
+        "\n")
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.ids = dict()
+        self.new = []
+
+    @classmethod
+    def for_blend_dir(cls, blend_dir):
+        """ Returns the catalogs of a blend file folder. Inside an asset
+        library the file of the library root is used, like blender does.
+        """
+        blend_dir = Path(blend_dir).resolve()
+        for library in bpy.context.preferences.filepaths.asset_libraries:
+            root = Path(bpy.path.abspath(library.path)).resolve()
+            if root==blend_dir or root in blend_dir.parents:
+                return cls(root / cls.FILENAME)
+        return cls(blend_dir / cls.FILENAME)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as catsfile:
+                lines = catsfile.read().splitlines()
+        except OSError:
+            return
+        for line in lines:
+            parts = line.split(":", 2)
+            if line.startswith("#") or len(parts)<2:
+                continue
+            self.ids.setdefault(parts[1], parts[0])
+
+    def catalog_id(self, catalog_path):
+        """Returns the id of a catalog path like "Metal/Painted", adds it and its parents if needed."""
+        catalog_id = self.ids.get(catalog_path)
+        if catalog_id:
+            return catalog_id
+        parent = catalog_path.rpartition("/")[0]
+        if parent:
+            self.catalog_id(parent)
+        catalog_id = str(uuid.uuid5(self.NAMESPACE, catalog_path))
+        self.ids[catalog_path] = catalog_id
+        self.new.append(f"{catalog_id}:{catalog_path}:{catalog_path.replace('/', '-')}")
+        return catalog_id
+
+    @contextmanager
+    def locked(self):
+        """Holds a lock file next to the catalog file, so only one process saves at a time."""
+        lock_path = self.path.with_name(f"{self.FILENAME}.lock")
+        end = time.monotonic() + self.LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time()-lock_path.stat().st_mtime>self.LOCK_STALE:
+                        lock_path.unlink()
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic()>end:
+                    raise TimeoutError(f"{lock_path} is locked by another import")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            try:
+                lock_path.unlink()
+            except OSError:
+                pass
+
+    def save(self):
+        if not self.new:
+            return
+        with self.locked():
+            # read again, another shard may have added catalogs since load()
+            try:
+                with open(self.path, "r", encoding="utf-8") as catsfile:
+                    content = catsfile.read()
+            except OSError:
+                content = self.HEADER
+            existing = {line.split(":", 2)[1] for line in content.splitlines() if not line.startswith("#") and line.count(":")>=1}
+            lines = [line for line in self.new if line.split(":", 2)[1] not in existing]
+            if lines:
+                if content and not content.endswith("\n"):
+                    content += "\n"
+                tmp_path = self.path.with_name(f"{self.FILENAME}.{os.getpid()}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as catsfile:
+                    catsfile.write(content + "\n".join(lines) + "\n")
+                os.replace(tmp_path, self.path)
+        self.new = []
+
+def load_catalog_mapping(filepath):
+    """ Reads a json file of {glob pattern: catalog path} pairs. The patterns
+    are matched against the folder path of a material below the library
+    root, the first match wins.
+    """
+    with open(filepath) as jsonfile:
+        return list(json.load(jsonfile).items())
+
+def record_catalog(record, root_catalog="", mapping=()):
+    """Returns the catalog path of a MaterialRecord, or "" for none."""
+    relpath = "/".join(record.category + (record.path.name,))
+    for pattern, catalog_path in mapping:
+        if matches_any(record.path.name, relpath, (pattern,)):
+            return catalog_path.strip("/")
+    # the folder of the material itself is not a catalog
+    parts = [part.strip() for part in root_catalog.split("/")] + list(record.category)
+    return "/".join(part.replace(":", "-") for part in parts if part!="")
+
+def add_asset_tags(mat, tags):
+    """Adds tags to a material asset, skipping empty and existing ones."""
+    existing = {tag.name for tag in mat.asset_data.tags}
+    for tag in tags:
+        if tag=="" or tag in existing:
+            continue
+        mat.asset_data.tags.new(tag)
+        existing.add(tag)
+
 class OLI_OT_reset_keywords(bpy.types.Operator):
     """Tooltip"""
     bl_idname = "olitools.reset_keywords"
@@ -43,15 +1060,9 @@ class OLI_OT_reset_keywords(bpy.types.Operator):
     def execute(self, context):
         preferences = context.preferences
         addon_prefs = preferences.addons[__name__].preferences
-        addon_prefs.ao_keys          = "_ao, _AO, ambientocclusion, AmbientOcclusion, ambientOcclusion"
-        addon_prefs.diffuse_keys     = "_diffuse, basemap, albedo, Albedo, _alb"
-        addon_prefs.roughness_keys   = "roughness, _rgh, Roughness"
-        addon_prefs.normal_keys      = "_nrm, _normal, NormalMap, normalmap"
-        addon_prefs.height_keys      = "_height, HeightMap, heightmap"
-        addon_prefs.reflection_keys  = "_reflection, _ref, Reflection"
-        addon_prefs.metal_keys       = "_met, metalness, Metalness"
-        addon_prefs.emission_keys    = "_emi, Emission, emissive"
-        addon_prefs.thumbnail_keys   = "_render, thumbnail, Thumbnail"
+        for tkey, attr in KEYWORD_PREFS:
+            setattr(addon_prefs, attr, DEFAULT_KEYWORDS[tkey])
+        clear_keyword_profile_cache()
         return {'FINISHED'}
 
 class OLI_OT_save_keywords(bpy.types.Operator):
@@ -79,6 +1090,8 @@ class OLI_OT_save_keywords(bpy.types.Operator):
         tex_keywords["reflection"]  = addon_prefs.reflection_keys
         tex_keywords["metal"]       = addon_prefs.metal_keys
         tex_keywords["emission"]    = addon_prefs.emission_keys
+        tex_keywords["orm"]         = addon_prefs.orm_keys
+        tex_keywords["mra"]         = addon_prefs.mra_keys
         tex_keywords["render"]      = addon_prefs.thumbnail_keys
 
         cPath=Path(bpy.utils.resource_path(type="USER")) / "config" / "ImportMaterialFolderSettings.json"
@@ -124,7 +1137,11 @@ class OLI_OT_load_keywords(bpy.types.Operator):
         addon_prefs.reflection_keys = tex_keywords["reflection"]
         addon_prefs.metal_keys = tex_keywords["metal"]
         addon_prefs.emission_keys = tex_keywords["emission"]
+        # files saved before packed maps existed
+        addon_prefs.orm_keys = tex_keywords.get("orm", DEFAULT_KEYWORDS["orm"])
+        addon_prefs.mra_keys = tex_keywords.get("mra", DEFAULT_KEYWORDS["mra"])
         addon_prefs.thumbnail_keys = tex_keywords["render"]
+        clear_keyword_profile_cache()
 
         return {'FINISHED'}
 
@@ -141,62 +1158,76 @@ class OLI_AP_material_importer_prefs(AddonPreferences):
 
     file_types: bpy.props.StringProperty(
         name="File Types",
-        default="jpg, png, tga, tif, tiff",
+        default=DEFAULT_FILE_TYPES,
         description="File types that will be aknowledged as textures."
     )
 
     # ------- Ambient Occlusion -------------
     ao_keys: StringProperty( 
         name ="Ambient Occlusion",
-        default = "_ao, _AO, ambientocclusion, AmbientOcclusion, ambientOcclusion",
+        default = DEFAULT_KEYWORDS["ao"],
         )
 
     # ------- Diffuse/Albedo -------------
     diffuse_keys: StringProperty( 
         name="Diffuse/Albedo",
-        default="_diffuse, basemap, albedo, Albedo, _alb",
+        default=DEFAULT_KEYWORDS["diffuse"],
         )
 
     # ------- Roughness -------------
     roughness_keys: StringProperty( 
         name="Roughness",
-        default="roughness, _rgh, Roughness",
+        default=DEFAULT_KEYWORDS["roughness"],
         )
 
     # ------- Normal -------------
     normal_keys: StringProperty( 
         name="Normal",
-        default="_nrm, _normal, NormalMap, normalmap",
+        default=DEFAULT_KEYWORDS["normal"],
         )
 
     # ------- Height -------------
     height_keys: StringProperty( 
         name="Height",
-        default="_height, HeightMap, heightmap",
+        default=DEFAULT_KEYWORDS["height"],
         )
 
     # ------- Thumbnail -------------
     thumbnail_keys: StringProperty( 
         name="Thumbnail",
-        default="_render, thumbnail, Thumbnail",
+        default=DEFAULT_KEYWORDS["render"],
         )
 
     # ------- Reflection -------------
     reflection_keys: StringProperty( 
         name="Reflection",
-        default="_reflection, _ref, Reflection"
+        default=DEFAULT_KEYWORDS["reflection"]
         )
 
     # ------- Metalness -------------
     metal_keys: StringProperty( 
         name="Metalness",
-        default="_met, metalness, Metalness",
+        default=DEFAULT_KEYWORDS["metal"],
         )
 
     # ------- Emission -------------
     emission_keys: StringProperty( 
         name="Emission",
-        default="_emi, Emission, emissive",
+        default=DEFAULT_KEYWORDS["emission"],
+        )
+
+    # ------- Packed AO/Roughness/Metalness -------------
+    orm_keys: StringProperty( 
+        name="Packed ORM/ARM",
+        description="Packed maps with ambient occlusion in red, roughness in green and metalness in blue",
+        default=DEFAULT_KEYWORDS["orm"],
+        )
+
+    # ------- Packed Metalness/Roughness/AO -------------
+    mra_keys: StringProperty( 
+        name="Packed MRA",
+        description="Packed maps with metalness in red, roughness in green and ambient occlusion in blue",
+        default=DEFAULT_KEYWORDS["mra"],
         )
 
     def draw(self, context):
@@ -215,147 +1246,688 @@ class OLI_AP_material_importer_prefs(AddonPreferences):
         box.prop(self, "reflection_keys")
         box.prop(self, "metal_keys")
         box.prop(self, "emission_keys")
+        box.prop(self, "orm_keys")
+        box.prop(self, "mra_keys")
 
         row = self.layout.row()
         row.operator("olitools.reset_keywords", text="Reset Keywords")
         row.operator("olitools.save_keywords", text="Save Keywords")
         row.operator("olitools.load_keywords", text="Load Keywords")
 
-def get_node_by_id(mat, idname):
-    for key, node in  mat.node_tree.nodes.items():
-        if node.bl_idname == idname:
-            return node
-    return None
+def normalize_path(filepath):
+    """Makes a (blender relative) file path comparable to other paths."""
+    return os.path.normcase(os.path.normpath(bpy.path.abspath(str(filepath))))
+
+class ImageIndex:
+    """ Maps normalized absolute file paths to image datablocks.
+    Built once per import and updated as images are loaded, so finding an
+    existing image doesn't need a scan of bpy.data.images per texture.
+
+    skip_unchanged: Existing images are only reloaded if the file changed since they were loaded
+    lazy: New images only point at their file, blender reads it on first use
+    """
+
+    MTIME_KEY = "material_importer_mtime"
+
+    def __init__(self, skip_unchanged=False, lazy=False):
+        self.skip_unchanged = skip_unchanged
+        self.lazy = lazy
+        self.images = dict()
+        for img in bpy.data.images:
+            if img.filepath=="":
+                continue
+            self.images.setdefault(normalize_path(img.filepath), img)
+        self.count = len(bpy.data.images)
+
+    def is_current(self, skip_unchanged, lazy):
+        """Checks if the index can be kept for another import, images added elsewhere need a rebuild."""
+        return self.skip_unchanged==skip_unchanged and self.lazy==lazy and self.count==len(bpy.data.images)
 
-def generate_texture_nodes(mat, tpath, offset=(0,0)):
+    def load(self, tpath):
+        """ Returns the image datablock of a file, loads it if there is none yet.
+        A <UDIM> path is loaded as one tiled image.
+        """
+        key = normalize_path(tpath)
+        img = self.images.get(key)
+        if img is not None:
+            try:
+                img.name
+            except ReferenceError:
+                # removed since the index was built
+                img = None
+        tiles = udim_tiles(tpath) if UDIM_TOKEN in str(tpath) else None
+        mtime = None
+        if self.skip_unchanged:
+            try:
+                mtime = max(os.stat(tile).st_mtime for _, tile in tiles) if tiles else os.stat(tpath).st_mtime
+            except OSError:
+                pass
+        if img is None:
+            filepath = str(tiles[0][1]) if tiles else str(tpath)
+            with import_profiler.span("images"):
+                if self.lazy:
+                    # a placeholder without pixels, setting the filepath doesn't read the file
+                    img = bpy.data.images.new(os.path.basename(filepath), 1, 1)
+                    img.source = 'FILE'
+                    img.filepath = filepath
+                else:
+                    img = bpy.data.images.load(filepath)
+                if tiles:
+                    img.source = 'TILED'
+                    known = {tile.number for tile in img.tiles}
+                    for number, _ in tiles:
+                        if number not in known:
+                            img.tiles.new(tile_number=number)
+            self.images[key] = img
+            self.count = len(bpy.data.images)
+        elif mtime is None or img.get(self.MTIME_KEY)!=mtime:
+            with import_profiler.span("images"):
+                if self.lazy:
+                    # dropping the pixels is enough, the new file is read on next use
+                    img.buffers_free()
+                else:
+                    img.reload()
+        if mtime is not None:
+            img[self.MTIME_KEY] = mtime
+        return img
+
+class NodeRegistry:
+    """ Keeps track of the nodes of one material by bl_idname and by role
+    (e.g. "mapping", "output", "bsdf", "normal_map", "tex_diffuse").
+    Filled while the material is built, so finding a node doesn't need a
+    scan of the node tree. The role is stored on the node itself, so an
+    existing material can be registered again with a single scan.
+    """
+
+    ROLE_KEY = "material_importer_role"
+
+    def __init__(self, mat):
+        self.mat = mat
+        self.nodes = mat.node_tree.nodes
+        self.links = mat.node_tree.links
+        self.by_role = dict()
+        self.by_type = dict()
+
+    @classmethod
+    def from_material(cls, mat):
+        """Registers all nodes of an existing material."""
+        registry = cls(mat)
+        for node in registry.nodes:
+            registry.register(node, node.get(cls.ROLE_KEY))
+        # the default nodes of a new material have no role yet
+        if "output" not in registry.by_role and registry.first("ShaderNodeOutputMaterial"):
+            registry.register(registry.first("ShaderNodeOutputMaterial"), "output")
+        if "bsdf" not in registry.by_role and registry.first("ShaderNodeBsdfPrincipled"):
+            registry.register(registry.first("ShaderNodeBsdfPrincipled"), "bsdf")
+        # materials of older versions have a mapping node without a role
+        if "mapping" not in registry.by_role and registry.first("ShaderNodeMapping"):
+            registry.register(registry.first("ShaderNodeMapping"), "mapping")
+        return registry
+
+    def register(self, node, role=None):
+        nodes = self.by_type.setdefault(node.bl_idname, [])
+        if node not in nodes:
+            nodes.append(node)
+        if role:
+            node[self.ROLE_KEY] = role
+            self.by_role[role] = node
+        return node
+
+    def new(self, idname, role=None, location=None):
+        """Creates and registers a new node."""
+        node = self.nodes.new(idname)
+        if location is not None:
+            node.location = location
+        return self.register(node, role)
+
+    def remove(self, node):
+        self.by_type.get(node.bl_idname, []).remove(node)
+        role = node.get(self.ROLE_KEY)
+        if role and self.by_role.get(role)==node:
+            del self.by_role[role]
+        self.nodes.remove(node)
+
+    def get(self, role):
+        return self.by_role.get(role)
+
+    def first(self, idname):
+        nodes = self.by_type.get(idname)
+        return nodes[0] if nodes else None
+
+def generate_texture_nodes(mat, tpath, offset=(0,0), images=None, registry=None, role=None):
     """ Generates nodes for mapping, texture coordinates and image texture.
     Only generates mapping node if no mapping node exists. Otherwise recycles.
+
+    images: An ImageIndex to look up existing images. Without one bpy.data.images is searched.
+    registry: The NodeRegistry of the material. Without one the node tree is scanned.
+    role: The role the image node is registered with
     """
-    
-    map_node = get_node_by_id(mat, "ShaderNodeMapping")
+    if registry is None:
+        registry = NodeRegistry.from_material(mat)
+
+    map_node = registry.get("mapping")
     if not map_node:
         # Texture Coordinates
-        co_node=mat.node_tree.nodes.new("ShaderNodeTexCoord")
-        co_node.location=(-1000+offset[0],0+offset[1])
+        co_node=registry.new("ShaderNodeTexCoord", "texcoord", (-1000+offset[0],0+offset[1]))
 
         # Mapping node
-        map_node=mat.node_tree.nodes.new("ShaderNodeMapping")
-        map_node.location=(-750+offset[0],0+offset[1])
-        mat.node_tree.links.new(co_node.outputs[2], map_node.inputs[0])
+        map_node=registry.new("ShaderNodeMapping", "mapping", (-750+offset[0],0+offset[1]))
+        registry.links.new(co_node.outputs[2], map_node.inputs[0])
 
     # Texture
-    tex_node=mat.node_tree.nodes.new("ShaderNodeTexImage")
-    tex_node.location=(-500+offset[0],0+offset[1])
-    mat.node_tree.links.new(map_node.outputs[0], tex_node.inputs[0])
+    tex_node=registry.new("ShaderNodeTexImage", role, (-500+offset[0],0+offset[1]))
+    registry.links.new(map_node.outputs[0], tex_node.inputs[0])
     
     # check for existing imgages
-    img=None
-    for i in bpy.data.images:
-        if str(tpath)==i.filepath:
-            i.reload()
-            img = i
-            break
-    tex_node.image = img if img!=None else bpy.data.images.load(str(tpath))
+    if images is None:
+        images = ImageIndex()
+    tex_node.image = images.load(tpath)
     return tex_node
 
-def generate_material(matName, tfiles, markasset=False, convertnormals=True, overwrite=True):
+# map type -> location offset of its image node, in build order
+TEXTURE_OFFSETS = {
+    "diffuse":      (-500,900),
+    "ao":           (-500,1200),
+    "reflection":   (-500,1500),
+    "roughness":    (-500,300),
+    "metal":        (-500,600),
+    "emission":     (-500,0),
+    "normal":       (-500,-300),
+    "height":       (-500,-600),
+    "orm":          (-500,1800),
+    "mra":          (-500,2100),
+    }
+
+# packed map type -> map types of its red, green and blue channel
+PACKED_MAPS = {
+    "orm":          ("ao", "roughness", "metal"),
+    "mra":          ("metal", "roughness", "ao"),
+    }
+
+# map types whose images contain data instead of colors
+NON_COLOR_MAPS = {"ao", "reflection", "roughness", "metal", "emission", "normal", "height", "orm", "mra"}
+
+# map type -> principled bsdf input index
+BSDF_INPUTS = {"diffuse": 0, "metal": 6, "roughness": 9, "emission": 19}
+
+# map type -> pbr node group input name
+GROUP_INPUTS = {"diffuse": "Base Color", "metal": "Metallic", "roughness": "Roughness", "emission": "Emission"}
+
+PBR_GROUP_NAME = "Material Importer PBR"
+NORMAL_GROUP_NAME = "Material Importer DX to GL Normal"
+
+def new_group_socket(group, name, in_out, socket_type, default=None):
+    """Adds an input or output to a node group, for both the 3.x and 4.x API."""
+    if hasattr(group, "interface"):
+        socket = group.interface.new_socket(name, in_out=in_out, socket_type=socket_type)
+    elif in_out=='INPUT':
+        socket = group.inputs.new(socket_type, name)
+    else:
+        socket = group.outputs.new(socket_type, name)
+    if default is not None:
+        socket.default_value = default
+    return socket
+
+def get_input(node, *names):
+    """Returns the first existing input of a node. Socket names differ between blender versions."""
+    for name in names:
+        if name in node.inputs:
+            return node.inputs[name]
+    return None
+
+def get_normal_node_group():
+    """ Returns the node group converting DirectX- to OpenGL-style normal maps.
+    It is created once and shared by all materials.
+    """
+    group = bpy.data.node_groups.get(NORMAL_GROUP_NAME)
+    if group:
+        return group
+
+    group = bpy.data.node_groups.new(NORMAL_GROUP_NAME, "ShaderNodeTree")
+    new_group_socket(group, "Color", 'INPUT', "NodeSocketColor", (0.5, 0.5, 1.0, 1.0))
+    new_group_socket(group, "Color", 'OUTPUT', "NodeSocketColor")
+
+    nodes, links = group.nodes, group.links
+    group_in = nodes.new("NodeGroupInput")
+    group_in.location=(-400, 0)
+    group_out = nodes.new("NodeGroupOutput")
+    group_out.location=(300, 0)
+    seperatenode = nodes.new("ShaderNodeSeparateColor")
+    seperatenode.location=(-200, 0)
+    subnode = nodes.new("ShaderNodeMath")
+    subnode.operation = 'SUBTRACT'
+    subnode.inputs[0].default_value = 1
+    subnode.location=(-30, -50)
+    combinenode = nodes.new("ShaderNodeCombineColor")
+    combinenode.location=(140, 0)
+
+    links.new(group_in.outputs[0], seperatenode.inputs[0])
+    links.new(seperatenode.outputs[1], subnode.inputs[1])
+    links.new(subnode.outputs[0], combinenode.inputs[1])
+    links.new(seperatenode.outputs[0], combinenode.inputs[0])
+    links.new(seperatenode.outputs[2], combinenode.inputs[2])
+    links.new(combinenode.outputs[0], group_out.inputs[0])
+    return group
+
+def get_pbr_node_group():
+    """ Returns the node group containing the principled bsdf, normal map and
+    displacement nodes. It is created once and shared by all materials.
+    """
+    group = bpy.data.node_groups.get(PBR_GROUP_NAME)
+    if group:
+        return group
+
+    group = bpy.data.node_groups.new(PBR_GROUP_NAME, "ShaderNodeTree")
+    new_group_socket(group, "Base Color", 'INPUT', "NodeSocketColor", (0.8, 0.8, 0.8, 1.0))
+    new_group_socket(group, "Metallic", 'INPUT', "NodeSocketFloat", 0.0)
+    new_group_socket(group, "Roughness", 'INPUT', "NodeSocketFloat", 0.5)
+    new_group_socket(group, "Emission", 'INPUT', "NodeSocketColor", (0.0, 0.0, 0.0, 1.0))
+    new_group_socket(group, "Normal", 'INPUT', "NodeSocketColor", (0.5, 0.5, 1.0, 1.0))
+    # 0.5 is the midlevel of the displacement, so no height map means no displacement
+    new_group_socket(group, "Height", 'INPUT', "NodeSocketFloat", 0.5)
+    new_group_socket(group, "BSDF", 'OUTPUT', "NodeSocketShader")
+    new_group_socket(group, "Displacement", 'OUTPUT', "NodeSocketVector")
+
+    nodes, links = group.nodes, group.links
+    group_in = nodes.new("NodeGroupInput")
+    group_in.location=(-600, 0)
+    group_out = nodes.new("NodeGroupOutput")
+    group_out.location=(400, 0)
+    shader_node = nodes.new("ShaderNodeBsdfPrincipled")
+    shader_node.location=(50, 150)
+    normalnode = nodes.new("ShaderNodeNormalMap")
+    normalnode.location=(-250, -250)
+    dispNode = nodes.new("ShaderNodeDisplacement")
+    dispNode.location=(50, -450)
+    dispNode.inputs[2].default_value = 0.03
+
+    links.new(group_in.outputs["Base Color"], shader_node.inputs["Base Color"])
+    links.new(group_in.outputs["Metallic"], shader_node.inputs["Metallic"])
+    links.new(group_in.outputs["Roughness"], shader_node.inputs["Roughness"])
+    links.new(group_in.outputs["Emission"], get_input(shader_node, "Emission Color", "Emission"))
+    if "Emission Strength" in shader_node.inputs:
+        shader_node.inputs["Emission Strength"].default_value = 1.0
+    links.new(group_in.outputs["Normal"], normalnode.inputs["Color"])
+    links.new(normalnode.outputs[0], shader_node.inputs["Normal"])
+    links.new(group_in.outputs["Height"], dispNode.inputs["Height"])
+    links.new(shader_node.outputs[0], group_out.inputs["BSDF"])
+    links.new(dispNode.outputs[0], group_out.inputs["Displacement"])
+    return group
+
+def packed_channels(tkey, tfiles):
+    """ Returns a {channel index: map type} dict of the channels of a packed
+    map that are used. Maps with their own texture and channels of an
+    earlier packed map are left out.
+    """
+    covered = {other for other in tfiles if other not in PACKED_MAPS}
+    for other, channel_keys in PACKED_MAPS.items():
+        if other==tkey:
+            break
+        if other in tfiles:
+            covered.update(channel_keys)
+    return {index: channel_key for index, channel_key in enumerate(PACKED_MAPS[tkey]) if channel_key not in covered}
+
+def link_channels(registry, seperatenode, channels):
+    """Connects the outputs of a separate color node to the shader inputs of their map types."""
+    group_node = registry.get("pbr_group")
+    shader_node = registry.get("bsdf")
+    for index, channel_key in channels.items():
+        if group_node and channel_key in GROUP_INPUTS:
+            registry.links.new(seperatenode.outputs[index], group_node.inputs[GROUP_INPUTS[channel_key]])
+        elif shader_node and channel_key in BSDF_INPUTS:
+            registry.links.new(seperatenode.outputs[index], shader_node.inputs[BSDF_INPUTS[channel_key]])
+
+def link_texture(registry, tkey, tex_node, convertnormals=True, channels=None):
+    """ Connects an image node to the shader and creates the helper nodes
+    of its map type, e.g. the normal map or the displacement node.
+    Works with the principled bsdf as well as with the pbr node group.
+    Helper nodes are registered with roles starting with the map type.
+
+    channels: The used channels of a packed map, see packed_channels
+    """
+    links = registry.links
+    group_node = registry.get("pbr_group")
+    shader_node = registry.get("bsdf")
+    output_node = registry.get("output")
+    color = tex_node.outputs[0]
+
+    if tkey=="normal":
+        # normal fixer
+        if convertnormals and group_node:
+            convertnode = registry.new("ShaderNodeGroup", "normal_convert", (-200, -400))
+            convertnode.node_tree = get_normal_node_group()
+            links.new(color, convertnode.inputs[0])
+            color = convertnode.outputs[0]
+        elif convertnormals:
+            seperatenode = registry.new("ShaderNodeSeparateColor", "normal_separate", (-710, -400))
+            subnode = registry.new("ShaderNodeMath", "normal_subtract", (-540, -400))
+            subnode.operation = 'SUBTRACT'
+            subnode.inputs[0].default_value = 1
+            combinenode = registry.new("ShaderNodeCombineColor", "normal_combine", (-370, -400))
+            # connections
+            links.new(color, seperatenode.inputs[0])
+            links.new(seperatenode.outputs[1], subnode.inputs[1])
+            links.new(subnode.outputs[0], combinenode.inputs[1])
+            links.new(seperatenode.outputs[0], combinenode.inputs[0])
+            links.new(seperatenode.outputs[2], combinenode.inputs[2])
+            color = combinenode.outputs[0]
+
+        if group_node:
+            links.new(color, group_node.inputs["Normal"])
+        else:
+            normalnode = registry.new("ShaderNodeNormalMap", "normal_map", (-200, -400))
+            links.new(color, normalnode.inputs[1])
+            links.new(normalnode.outputs[0], shader_node.inputs[22])
+
+    elif tkey=="height":
+        if group_node:
+            links.new(color, group_node.inputs["Height"])
+            links.new(group_node.outputs["Displacement"], output_node.inputs[2])
+        else:
+            dispNode = registry.new("ShaderNodeDisplacement", "height_displacement", (120, -500))
+            dispNode.inputs[2].default_value = 0.03
+            links.new(color, dispNode.inputs[0])
+            links.new(dispNode.outputs[0], output_node.inputs[2])
+
+    elif tkey in PACKED_MAPS:
+        # one image for up to three maps
+        location = tex_node.location
+        seperatenode = registry.new("ShaderNodeSeparateColor", f"{tkey}_separate", (location[0]+290, location[1]))
+        links.new(color, seperatenode.inputs[0])
+        link_channels(registry, seperatenode, channels or dict())
+
+    elif group_node:
+        if tkey in GROUP_INPUTS:
+            links.new(color, group_node.inputs[GROUP_INPUTS[tkey]])
+
+    elif tkey in BSDF_INPUTS:
+        links.new(color, shader_node.inputs[BSDF_INPUTS[tkey]])
+
+def generate_material(matName, tfiles, markasset=False, convertnormals=True, overwrite=True, images=None, use_groups=False, previews=None, info=None):
     """Generates a material from a list of texture file paths.
 
     markasset: Marks the material as a blender asset, so it will show up in the assetdb
     convertnormals: Adds nodes to convert from DirectX- to OpenGL-style normal maps
+    images: An ImageIndex shared by all materials of an import
+    use_groups: Uses shared node groups instead of individual shader nodes per material
+    previews: A PreviewQueue to create the asset preview later
+    info: A {map type: TextureInfo} dict, used for colorspace decisions
     """
+    if images is None:
+        images = ImageIndex()
 
     mat=bpy.data.materials.new(matName)
     mat.cycles.displacement_method = 'BOTH'
     mat.use_nodes=True
-    shader_node=mat.node_tree.nodes["Principled BSDF"]
-    output_node=get_node_by_id(mat, "ShaderNodeOutputMaterial")
+    registry = NodeRegistry.from_material(mat)
+    output_node=registry.get("output")
     if not output_node:
         assert("No output node?!!")
 
-    # Diffuse
-    if "diffuse" in tfiles:
-        diftex = generate_texture_nodes(mat, tfiles["diffuse"], offset=(-500,900))
-        mat.node_tree.links.new(diftex.outputs[0], shader_node.inputs[0])
-
-    # AO
-    if "ao" in tfiles:
-        aoTex = generate_texture_nodes(mat, tfiles["ao"], offset=(-500,1200))
-        aoTex.image.colorspace_settings.name = 'Non-Color'
-
-    # AO
-    if "reflection" in tfiles:
-        refTex = generate_texture_nodes(mat, tfiles["reflection"], offset=(-500,1500))
-        refTex.image.colorspace_settings.name = 'Non-Color'
-
-    # Roughness
-    if "roughness" in tfiles:
-        roughtex = generate_texture_nodes(mat, tfiles["roughness"], offset=(-500,300))
-        roughtex.image.colorspace_settings.name = 'Non-Color'
-        mat.node_tree.links.new(roughtex.outputs[0], shader_node.inputs[9])
-
-    # Metalness
-    if "metal" in tfiles:
-        metalTex = generate_texture_nodes(mat, tfiles["metal"], offset=(-500,600))
-        metalTex.image.colorspace_settings.name = 'Non-Color'
-        mat.node_tree.links.new(metalTex.outputs[0], shader_node.inputs[6])
-
-    # Emission
-    if "emission" in tfiles:
-        emiTex = generate_texture_nodes(mat, tfiles["emission"], offset=(-500,0))
-        emiTex.image.colorspace_settings.name = 'Non-Color'
-        mat.node_tree.links.new(emiTex.outputs[0], shader_node.inputs[19])
-
-    # Normalmap
-    if "normal" in tfiles:
-        normaltex = generate_texture_nodes(mat, tfiles["normal"], offset=(-500,-300))
-        normaltex.image.colorspace_settings.name = 'Non-Color'
-        normalnode = mat.node_tree.nodes.new("ShaderNodeNormalMap")
-        normalnode.location=(-200, -400)
-        # normal fixer
-        if convertnormals:
-            seperatenode = mat.node_tree.nodes.new("ShaderNodeSeparateColor")
-            seperatenode.location=(-710, -400)
-            subnode = mat.node_tree.nodes.new("ShaderNodeMath")
-            subnode.operation = 'SUBTRACT'
-            subnode.inputs[0].default_value = 1
-            subnode.location=(-540, -400)
-            combinenode = mat.node_tree.nodes.new("ShaderNodeCombineColor")
-            combinenode.location=(-370, -400)
-            # connections
-            mat.node_tree.links.new(normaltex.outputs[0], seperatenode.inputs[0])
-            mat.node_tree.links.new(seperatenode.outputs[1], subnode.inputs[1])
-            mat.node_tree.links.new(subnode.outputs[0], combinenode.inputs[1])
-            mat.node_tree.links.new(seperatenode.outputs[0], combinenode.inputs[0])
-            mat.node_tree.links.new(seperatenode.outputs[2], combinenode.inputs[2])
-            mat.node_tree.links.new(combinenode.outputs[0], normalnode.inputs[1])
-        else:
-            mat.node_tree.links.new(normaltex.outputs[0], normalnode.inputs[1])
-            
-        mat.node_tree.links.new(normalnode.outputs[0], shader_node.inputs[22])
+    if use_groups:
+        registry.remove(registry.get("bsdf"))
+        group_node = registry.new("ShaderNodeGroup", "pbr_group", (10, 300))
+        group_node.node_tree = get_pbr_node_group()
+        registry.links.new(group_node.outputs["BSDF"], output_node.inputs[0])
+
+    for tkey, offset in TEXTURE_OFFSETS.items():
+        if tkey not in tfiles:
+            continue
+        channels = None
+        if tkey in PACKED_MAPS:
+            # separate maps override the channels of packed ones
+            channels = packed_channels(tkey, tfiles)
+            if not channels:
+                continue
+        tex_node = generate_texture_nodes(mat, tfiles[tkey], offset=offset, images=images, registry=registry, role=f"tex_{tkey}")
+        colorspace = texture_colorspace(tkey, info.get(tkey) if info else None)
+        if colorspace:
+            tex_node.image.colorspace_settings.name = colorspace
+        link_texture(registry, tkey, tex_node, convertnormals=convertnormals, channels=channels)
+
+    if markasset:
+        mark_material_asset(mat, tfiles, previews=previews)
 
-    # Height
-    if "height" in tfiles:
-        heightTex = generate_texture_nodes(mat, tfiles["height"], offset=(-500,-600))
-        heightTex.image.colorspace_settings.name = 'Non-Color'
-        dispNode = mat.node_tree.nodes.new("ShaderNodeDisplacement")
-        dispNode.location=(120, -500)
-        dispNode.inputs[2].default_value = 0.03
-        mat.node_tree.links.new(heightTex.outputs[0], dispNode.inputs[0])
-        mat.node_tree.links.new(dispNode.outputs[0], output_node.inputs[2])
+    return mat
 
+def mark_material_asset(mat, tfiles, previews=None):
+    """Marks a material as asset and sets its preview.
 
-    if markasset:
-        mat.asset_mark()
-        # return mat
-        if "thumbnail" in tfiles:
-            with bpy.context.temp_override(id=mat):
-                bpy.ops.ed.lib_id_load_custom_preview(filepath=str(tfiles["thumbnail"]))
+    previews: A PreviewQueue, the preview is then created later instead of right away
+    """
+    with import_profiler.span("asset"):
+        if not mat.asset_data:
+            mat.asset_mark()
+        if previews is not None:
+            previews.add(mat, tfiles)
+            return
+    with import_profiler.span("previews"):
+        set_material_preview(mat, tfiles.get("render"))
+
+def preview_override(mat):
+    """Context override for the preview operators, also working from timers."""
+    override = {"id": mat}
+    wm = bpy.context.window_manager
+    if bpy.context.window is None and wm and len(wm.windows)!=0:
+        override["window"] = wm.windows[0]
+    return override
+
+def set_material_preview(mat, thumbnail=None):
+    """Loads a thumbnail file as preview or renders a new preview."""
+    with bpy.context.temp_override(**preview_override(mat)):
+        if thumbnail:
+            bpy.ops.ed.lib_id_load_custom_preview(filepath=str(thumbnail))
         else:
-            with bpy.context.temp_override(id=mat):
-                bpy.ops.ed.lib_id_generate_preview()
+            bpy.ops.ed.lib_id_generate_preview()
 
-    return mat
+class PreviewQueue:
+    """ Creates asset previews after all materials of an import exist.
+    The work is spread over timer ticks, each tick gets a time budget so
+    blender stays responsive. Without timers (background mode) the
+    queue is processed right away with drain().
+
+    Rendered previews are stored as png files in the user config folder,
+    keyed by a hash of the texture files and the node setup. A material
+    with the same textures gets the stored file instead of a new render.
+    """
+
+    BUDGET = 0.1            # seconds of work per tick
+    STORE_TIMEOUT = 30.0    # seconds without any finished preview before giving up
+    STORE_INTERVAL = 0.25   # seconds between checks while only waiting for renders
+
+    def __init__(self):
+        self.pending = deque()
+        # rendered previews to save, in the order they were requested
+        self.storing = deque()
+        self.store_deadline = 0.0
+        self.total = 0
+        self.done = 0
+        self.use_cache = True
+        self.cache_dir = None
+        # import settings changing the look of a material, part of the cache key
+        self.setup = ""
+
+    def add(self, mat, tfiles):
+        self.pending.append((mat.name, tfiles.get("render"), self.content_key(tfiles)))
+        self.total+=1
+
+    def content_key(self, tfiles):
+        """Hashes name, size and modification time of all textures of a material."""
+        data = [self.setup]
+        for tkey, tpath in sorted(tfiles.items()):
+            try:
+                stat = os.stat(tpath)
+            except OSError:
+                return None
+            data.append(f"{tkey}:{Path(tpath).name}:{stat.st_size}:{stat.st_mtime_ns}")
+        return hashlib.blake2b("|".join(data).encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_cache_dir(self):
+        if self.cache_dir is None:
+            self.cache_dir = Path(bpy.utils.resource_path(type="USER")) / "config" / "material_import_previews"
+        return self.cache_dir
+
+    def process(self, mat_name, thumbnail, key):
+        mat = bpy.data.materials.get(mat_name)
+        if mat is None:
+            return
+        cached = self.get_cache_dir() / f"{key}.png" if key and self.use_cache else None
+        if thumbnail is None and cached and cached.exists():
+            thumbnail = cached
+        set_material_preview(mat, thumbnail)
+        if cached and thumbnail is None:
+            self.storing.append((mat_name, cached))
+            self.store_deadline = time.perf_counter() + self.STORE_TIMEOUT
+
+    def store(self, mat_name, cached):
+        """Saves a rendered preview to the cache. Returns False if it isn't rendered yet."""
+        mat = bpy.data.materials.get(mat_name)
+        if mat is None or mat.preview is None:
+            return True
+        width, height = mat.preview.image_size
+        if width==0 or height==0:
+            return False
+        pixels = array("f", [0.0]) * (width * height * 4)
+        mat.preview.image_pixels_float.foreach_get(pixels)
+        if not any(pixels):
+            return False
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        img = bpy.data.images.new("__material_preview_cache", width, height, alpha=True)
+        try:
+            img.pixels.foreach_set(pixels)
+            img.filepath_raw = str(cached)
+            img.file_format = 'PNG'
+            img.save()
+        except RuntimeError as e:
+            print(f"Material importer: could not cache preview of {mat_name}: {e}")
+        bpy.data.images.remove(img)
+        return True
+
+    def step(self, budget=None):
+        """Does the work of one tick. Returns True if work is left."""
+        end = time.perf_counter() + (self.BUDGET if budget is None else budget)
+        while self.pending and time.perf_counter()<end:
+            with import_profiler.span("previews"):
+                self.process(*self.pending.popleft())
+            self.done+=1
+
+        # previews render in a job one after another in the order they were
+        # requested, so only the oldest one is checked until it is done
+        while self.storing and time.perf_counter()<end:
+            if not self.store(*self.storing[0]):
+                break
+            self.storing.popleft()
+            self.store_deadline = time.perf_counter() + self.STORE_TIMEOUT
+        if self.storing and time.perf_counter()>self.store_deadline:
+            print(f"Material Importer: gave up caching {len(self.storing)} previews.")
+            self.storing.clear()
+        return bool(self.pending or self.storing)
+
+    def report_progress(self):
+        workspace = bpy.context.workspace
+        if workspace is None:
+            return
+        if self.pending:
+            workspace.status_text_set(f"Material Importer: preview {self.done} of {self.total}")
+        else:
+            workspace.status_text_set(None)
+
+    def timer_callback(self):
+        busy = self.step()
+        self.report_progress()
+        if self.pending:
+            return 0.01
+        if busy:
+            return self.STORE_INTERVAL
+        print(f"Material Importer: {self.done} previews done.")
+        self.total = self.done = 0
+        return None
+
+    def start(self):
+        """Processes the queue on timer ticks, or right away in background mode."""
+        if bpy.app.background:
+            self.drain()
+        elif not bpy.app.timers.is_registered(preview_queue_callback):
+            bpy.app.timers.register(preview_queue_callback, first_interval=0.01)
+
+    def drain(self):
+        while self.pending:
+            with import_profiler.span("previews"):
+                self.process(*self.pending.popleft())
+        self.storing.clear()
+        self.total = self.done = 0
+
+preview_queue = PreviewQueue()
+
+def preview_queue_callback():
+    # a module function, timers are matched by identity and bound methods are new objects on every access
+    return preview_queue.timer_callback()
+
+def remove_map_nodes(registry, tkey):
+    """Removes the image node of a map type and all its helper nodes."""
+    for role, node in list(registry.by_role.items()):
+        if role==f"tex_{tkey}" or role.startswith(f"{tkey}_"):
+            registry.remove(node)
+    # the group node stays, so its displacement must be disconnected explicitly
+    group_node = registry.get("pbr_group")
+    if tkey=="height" and group_node:
+        for link in list(group_node.outputs["Displacement"].links):
+            registry.links.remove(link)
+
+def update_material(mat, tfiles, convertnormals=True, images=None, use_groups=False, info=None):
+    """ Updates a material built by the importer to a new set of textures.
+    Keeps the material datablock, so all its users stay intact. Only image
+    nodes whose file changed get a new image, and only the nodes of map
+    types that appeared or disappeared are added or removed.
+
+    Returns the number of changed maps, or None if the material wasn't
+    built by the importer with the same node setup and has to be rebuilt.
+    """
+    if not mat.use_nodes or mat.node_tree is None:
+        return None
+    registry = NodeRegistry.from_material(mat)
+    if registry.get("mapping") is None or registry.get("output") is None:
+        return None
+    if (registry.get("pbr_group") is not None)!=use_groups:
+        return None
+    if images is None:
+        images = ImageIndex()
+
+    # a changed normal conversion setting rebuilds the normal nodes
+    converted = registry.get("normal_convert") or registry.get("normal_separate")
+    if "normal" in tfiles and registry.get("tex_normal") and bool(converted)!=convertnormals:
+        remove_map_nodes(registry, "normal")
+
+    changes = 0
+    for tkey, offset in TEXTURE_OFFSETS.items():
+        tex_node = registry.get(f"tex_{tkey}")
+        channels = packed_channels(tkey, tfiles) if tkey in PACKED_MAPS and tkey in tfiles else None
+        if tkey not in tfiles or channels=={}:
+            if tex_node:
+                remove_map_nodes(registry, tkey)
+                changes+=1
+            continue
+
+        if tex_node is None:
+            tex_node = generate_texture_nodes(mat, tfiles[tkey], offset=offset, images=images, registry=registry, role=f"tex_{tkey}")
+            link_texture(registry, tkey, tex_node, convertnormals=convertnormals, channels=channels)
+            changes+=1
+        else:
+            img = images.load(tfiles[tkey])
+            if tex_node.image!=img:
+                tex_node.image = img
+                changes+=1
+            seperatenode = registry.get(f"{tkey}_separate")
+            if channels and seperatenode:
+                # separate maps may have appeared or disappeared since
+                for output in seperatenode.outputs:
+                    for link in list(output.links):
+                        registry.links.remove(link)
+                link_channels(registry, seperatenode, channels)
+        colorspace = texture_colorspace(tkey, info.get(tkey) if info else None)
+        if colorspace:
+            tex_node.image.colorspace_settings.name = colorspace
+    return changes
 
 class OLI_PG_material_importer_settings(PropertyGroup):
 
@@ -396,6 +1968,522 @@ class OLI_PG_material_importer_settings(PropertyGroup):
         default=True,
         )
 
+    recursive : BoolProperty(
+        name="Search Subfolders",
+        description="Search nested folders. Folders with textures become materials, folders without become categories.",
+        default=False,
+        )
+
+    max_depth : IntProperty(
+        name="Max Depth",
+        description="How many folder levels are searched. 0 searches all levels.",
+        default=3,
+        min=0,
+        )
+
+    include_filter : StringProperty(
+        name="Include",
+        description="Comma-seperated glob patterns. Only material folders matching one are imported.",
+        default="",
+        )
+
+    exclude_filter : StringProperty(
+        name="Exclude",
+        description="Comma-seperated glob patterns. Matching folders are skipped with all their subfolders.",
+        default="",
+        )
+
+    category_tags : BoolProperty(
+        name="Category Tags",
+        description="Add the names of the parent folders as asset tags.",
+        default=True,
+        )
+
+    use_node_groups : BoolProperty(
+        name="Use Node Groups",
+        description="Build materials from shared node groups. Each material only gets its image nodes and one group node.",
+        default=False,
+        )
+
+    update_in_place : BoolProperty(
+        name="Update In Place",
+        description="Update existing imported materials instead of replacing them. Keeps the material and all its users.",
+        default=True,
+        )
+
+    deduplicate_textures : BoolProperty(
+        name="Share Identical Textures",
+        description="Hash texture files and load byte-identical files from different folders only once.",
+        default=False,
+        )
+
+    validate_textures : BoolProperty(
+        name="Validate Textures",
+        description="Read the texture file headers in background threads before import. Broken or empty files are skipped and reported.",
+        default=True,
+        )
+
+    resolution_tags : BoolProperty(
+        name="Resolution Tags",
+        description="Add the texture resolution (e.g. 2K) as asset tag. Needs texture validation.",
+        default=False,
+        )
+
+    skip_unchanged_previews : BoolProperty(
+        name="Keep Unchanged Previews",
+        description="Don't render new previews for updated materials whose textures didn't change.",
+        default=True,
+        )
+
+    cache_previews : BoolProperty(
+        name="Cache Previews",
+        description="Store rendered previews in the user config folder and reuse them for materials with the same textures.",
+        default=True,
+        )
+
+    skip_unchanged_images : BoolProperty(
+        name="Keep Unchanged Images",
+        description="Don't reload images that are already loaded, if their file didn't change since.",
+        default=True,
+        )
+
+    incremental : BoolProperty(
+        name="Only Changed Folders",
+        description="Skip material folders whose texture files didn't change since the last import. Uses a manifest file in the library folder.",
+        default=False,
+        )
+
+    lazy_images : BoolProperty(
+        name="Deferred Image Loading",
+        description="Only point images at their files. Blender reads them when they are first displayed or rendered, so browsing libraries import faster and use less memory.",
+        default=False,
+        )
+
+    use_catalogs : BoolProperty(
+        name="Folder Catalogs",
+        description="Put the material assets into asset catalogs named after their folders. Writes blender_assets.cats.txt next to the blend file or into its asset library.",
+        default=False,
+        )
+
+    catalog_root : StringProperty(
+        name="Root Catalog",
+        description="Catalog path all folder catalogs are put under, e.g. Materials/Vendor",
+        default="",
+        )
+
+    catalog_mapping : StringProperty(
+        name="Catalog Mapping",
+        description="Optional json file of {\"folder glob\": \"catalog/path\"} pairs used instead of the folder names",
+        default="",
+        subtype='FILE_PATH',
+        )
+
+    watch_library : BoolProperty(
+        name="Watch Library",
+        description="Keep the materials of the library folder in sync with their textures while working",
+        default=False,
+        )
+
+    write_timings : BoolProperty(
+        name="Write Timing Report",
+        description="Measure how long every import phase takes and write a json and csv report to the user config folder.",
+        default=False,
+        )
+
+# Summary of an import run. broken_files lists "path: error" lines.
+# report is the path of the timing report, if one was written.
+ImportResult = namedtuple("ImportResult", "imported skipped broken_files duplicates report", defaults=(None,))
+
+class LibraryWatcher:
+    """ Keeps a material library in sync while texture artists work on it.
+    Polled from a bpy.app.timers callback like the script reloader. Every
+    tick lists a few folders round robin, within a time budget, so the UI
+    stays responsive. A material folder whose texture files changed is
+    imported on its own, once it didn't change for DEBOUNCE seconds, so
+    half written exports are not picked up. At most IMPORTS folders are
+    imported per tick, the others wait for the next ticks.
+
+    The first pass only records the current state. Materials of deleted
+    folders are kept.
+    """
+
+    INTERVAL = 0.2
+    BUDGET = 0.02
+    DEBOUNCE = 0.5
+    IMPORTS = 2
+
+    def __init__(self):
+        self.root = None
+        # (path, category, depth) of every folder, checked round robin
+        self.queue = deque()
+        self.known = set()
+        self.signatures = dict()
+        # path -> (time of last change, MaterialRecord)
+        self.changed = dict()
+        # path -> MaterialRecord of settled folders waiting for their import
+        self.ready = dict()
+        # kept between imports, so an import doesn't scan all images
+        self.images = None
+        self.unvisited = 0
+        self.seeded = False
+        self.imported = 0
+
+    def start(self, root):
+        self.root = Path(root)
+        self.queue = deque([(str(self.root), (), 0)])
+        self.known = {str(self.root)}
+        self.signatures = dict()
+        self.changed = dict()
+        self.ready = dict()
+        self.images = None
+        self.unvisited = 1
+        self.seeded = False
+        self.imported = 0
+
+    def check(self, entry, settings, profile):
+        """Lists one folder. Returns a MaterialRecord if its textures changed, else None."""
+        path, category, depth = entry
+        try:
+            files, folders = list_folder(path)
+        except OSError:
+            # deleted folders are forgotten, their materials stay
+            self.known.discard(path)
+            self.signatures.pop(path, None)
+            return None
+        name = os.path.basename(path)
+        tfiles = classify_texture_files(files, profile) if depth>0 else None
+        if tfiles:
+            include = split_list(settings.include_filter)
+            if include and not matches_any(name, "/".join(category + (name,)), include):
+                self.signatures[path] = ()
+                return None
+            signature = folder_signature(files, profile)
+            known = self.signatures.get(path)
+            self.signatures[path] = signature
+            if known==signature or (known is None and not self.seeded):
+                return None
+            return MaterialRecord(material_name(name, category), tfiles, Path(path), category, signature)
+
+        # categories have an empty signature
+        self.signatures[path] = ()
+        max_depth = settings.max_depth if settings.recursive else 1
+        if max_depth!=0 and depth>=max_depth:
+            return None
+        exclude = split_list(settings.exclude_filter)
+        subcategory = category + (name,) if depth>0 else ()
+        for folder in folders:
+            if folder.path in self.known:
+                continue
+            if exclude and matches_any(folder.name, "/".join(subcategory + (folder.name,)), exclude):
+                continue
+            self.known.add(folder.path)
+            self.queue.append((folder.path, subcategory, depth+1))
+            self.unvisited+=1
+        return None
+
+    def tick(self, settings, profile):
+        end = time.perf_counter() + self.BUDGET
+        now = time.monotonic()
+
+        # changed folders are checked every tick until they settle
+        for path, (changed_at, record) in list(self.changed.items()):
+            update = self.check((path, record.category, len(record.category)+1), settings, profile)
+            if not self.signatures.get(path):
+                # deleted, or no textures left
+                del self.changed[path]
+            elif update is not None:
+                self.changed[path] = (now, update)
+            elif now-changed_at>=self.DEBOUNCE:
+                del self.changed[path]
+                self.ready[path] = record
+
+        for path in [path for path in self.ready if not self.signatures.get(path)]:
+            # deleted while waiting
+            del self.ready[path]
+        # folders changing again wait until they settled again
+        ready = [path for path in self.ready if path not in self.changed][:self.IMPORTS]
+        ready = [self.ready.pop(path) for path in ready]
+        if ready:
+            if self.images is None or not self.images.is_current(settings.skip_unchanged_images, settings.lazy_images):
+                self.images = ImageIndex(skip_unchanged=settings.skip_unchanged_images, lazy=settings.lazy_images)
+            result = import_material_library(self.root, settings, profile, records=ready, images=self.images)
+            self.imported += result.imported
+            print(f"Material importer: updated {', '.join(record.name for record in ready)}")
+
+        checked = 0
+        while self.queue and (checked==0 or time.perf_counter()<end) and checked<len(self.queue):
+            entry = self.queue.popleft()
+            first_visit = entry[0] not in self.signatures
+            record = self.check(entry, settings, profile)
+            if first_visit:
+                self.unvisited-=1
+                self.seeded = self.seeded or self.unvisited==0
+            if entry[0] in self.known:
+                self.queue.append(entry)
+            if record is not None:
+                self.changed[entry[0]] = (now, record)
+            checked+=1
+
+library_watcher = LibraryWatcher()
+
+def watch_library_callback():
+    """ Timer callback of the library watcher """
+    settings = bpy.context.scene.material_importer_settings
+    if not settings.watch_library:
+        print("Material Library Watcher deactivated.")
+        return None
+    addon_prefs = bpy.context.preferences.addons[__name__].preferences
+    library_watcher.tick(settings, get_keyword_profile(addon_prefs))
+    return library_watcher.INTERVAL
+
+@persistent
+def reset_watcher_on_load_callback(scene):
+    bpy.context.scene.material_importer_settings.watch_library = False
+
+def explain_material_library(root, settings, profile):
+    """ Dry run of an import, only matches the keywords and doesn't touch
+    any blender data. The matches are cached for the next import.
+    Returns the MaterialRecords and the ClassificationCache holding the
+    explanation of every folder.
+    """
+    cache = ClassificationCache(root, profile)
+    cache.load()
+    records = list(scan_material_library(
+        root, profile,
+        max_depth = settings.max_depth if settings.recursive else 1,
+        include = split_list(settings.include_filter),
+        exclude = split_list(settings.exclude_filter),
+        cache = cache))
+    cache.save()
+    return records, cache
+
+def explanation_table(records, cache):
+    """Returns the lines of a material, map type, file, keyword table with conflicts and unclassified files."""
+    rows = []
+    material_paths = set()
+    for record in records:
+        relpath = "/".join(record.category + (record.path.name,))
+        material_paths.add(relpath)
+        explanation = cache.visited[relpath]
+        name = record.name
+        for tkey, (filename, keyword) in explanation.matches.items():
+            rows.append((name, tkey, filename, keyword))
+            name = ""
+        for tkey, filename, keyword in explanation.conflicts:
+            rows.append(("", f"! {tkey}", filename, f"{keyword}, ignored"))
+        for filename in explanation.unclassified:
+            rows.append(("", "? none", filename, ""))
+    # folders with texture files, but no keyword at all
+    unmatched = [relpath for relpath, explanation in cache.visited.items() if relpath not in material_paths and not explanation.matches]
+    for relpath in unmatched:
+        rows.append((relpath, "? none", f"{len(cache.visited[relpath].unclassified)} files", ""))
+
+    header = ("Material", "Map", "File", "Keyword")
+    widths = [max(len(row[column]) for row in rows + [header]) for column in range(3)]
+    lines = []
+    for row in [header] + rows:
+        lines.append("  ".join(value.ljust(width) for value, width in zip(row, widths)) + "  " + row[3])
+    conflicts = sum(len(cache.visited[relpath].conflicts) for relpath in material_paths)
+    unclassified = sum(len(explanation.unclassified) for explanation in cache.visited.values())
+    lines.append(f"{len(records)} materials, {conflicts} conflicts, {unclassified} unclassified files, {len(unmatched)} folders without keywords")
+    return lines
+
+def top_folder(record):
+    """The name of the top level folder of the library a record is in."""
+    return record.category[0] if record.category else record.path.name
+
+def in_shard(top, shard):
+    """ Checks if a top level folder belongs to a (index, count) shard.
+    Materials are split by their top level folder, so a whole category
+    stays together.
+    """
+    index, count = shard
+    return zlib.crc32(top.encode("utf-8")) % count==index
+
+def import_material_library(root, settings, profile, shard=None, wm=None, records=None, catalog_dir=None, images=None):
+    """ Imports a material library into the current blend file.
+    Does the whole work of the import operator, but needs no UI, so it
+    can run in background mode as well.
+
+    settings: The OLI_PG_material_importer_settings to use
+    profile: The KeywordProfile used to classify the textures
+    shard: An (index, count) tuple, only imports one part of the library
+    wm: The window manager for progress reports
+    records: MaterialRecords to import instead of scanning the whole root,
+        materials of all other folders are kept
+    catalog_dir: Folder of the blend file the catalogs are written for, defaults to the current one
+    images: An ImageIndex to reuse, e.g. between imports of the library watcher
+    """
+    if settings.write_timings:
+        import_profiler.start()
+
+    new_mats=0
+    delete_mats=[]
+
+    partial = records is not None
+    cache = None
+    if partial:
+        if shard:
+            records = [record for record in records if in_shard(top_folder(record), shard)]
+        progress_total = len(records)
+    else:
+        # reuses the matches of a dry run
+        cache = ClassificationCache(root, profile)
+        cache.load()
+        records = scan_material_library(
+            root, profile,
+            max_depth = settings.max_depth if settings.recursive else 1,
+            include = split_list(settings.include_filter),
+            exclude = split_list(settings.exclude_filter),
+            with_signature = settings.incremental,
+            cache = cache,
+            shard = shard)
+        # folders are scanned while importing, so the progress is the position of the top level folder
+        top_folders = dict()
+        if wm:
+            _, folders = list_folder(root)
+            top_folders = {folder.name: index for index, folder in enumerate(folder for folder in folders if not shard or in_shard(folder.name, shard))}
+        progress_total = len(top_folders)
+    if wm:
+        wm.progress_begin(0, max(progress_total, 1))
+    progress = 0
+
+    manifest = None
+    if settings.incremental:
+        manifest = ImportManifest(root, profile, suffix=f"_{shard[0]}of{shard[1]}" if shard else "", settings_digest=import_settings_digest(settings))
+        manifest.load()
+        # before validating, so only the folders that are rebuilt are probed
+        records = manifest.changed(records)
+
+    broken_files = []
+    if settings.validate_textures:
+        records = validate_records(records)
+
+    if images is None:
+        images = ImageIndex(skip_unchanged=settings.skip_unchanged_images, lazy=settings.lazy_images)
+    preview_queue.use_cache = settings.cache_previews
+    preview_queue.setup = f"convert={settings.convert_from_directx}"
+
+    catalogs = None
+    mapping = ()
+    if settings.mark_asset and settings.use_catalogs:
+        if catalog_dir is None and bpy.data.filepath:
+            catalog_dir = Path(bpy.data.filepath).parent
+        if catalog_dir is None:
+            print("Material importer: catalogs are stored next to the blend file, save it first.")
+        else:
+            catalogs = AssetCatalogs.for_blend_dir(catalog_dir)
+            catalogs.load()
+        if catalogs and settings.catalog_mapping:
+            try:
+                mapping = load_catalog_mapping(bpy.path.abspath(settings.catalog_mapping))
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"Material importer: can't read catalog mapping: {e}")
+
+    mark_asset = settings.mark_asset
+    convert = settings.convert_from_directx
+    overwrite = settings.overwrite_materials
+
+    with ExitStack() as stack:
+        dedup = None
+        if settings.deduplicate_textures:
+            dedup = stack.enter_context(TextureDeduplicator())
+
+        for record in records:
+            start_ns = time.perf_counter_ns()
+            if wm:
+                progress = progress+1 if partial else top_folders.get(top_folder(record), progress)
+                wm.progress_update(progress)
+            tfiles = record.textures
+            matName = record.name
+            if record.info:
+                for tkey, info in record.info.items():
+                    if info.error:
+                        broken_files.append(f"{tfiles[tkey]}: {info.error}")
+                tfiles = {tkey: tpath for tkey, tpath in tfiles.items() if not record.info[tkey].error}
+                if len(tfiles)==0:
+                    continue
+            if dedup:
+                with import_profiler.span("dedup"):
+                    tfiles = dedup.resolve(tfiles)
+
+            mat = bpy.data.materials.get(matName)
+            if mat:
+                if not overwrite:
+                    continue
+                changes = None
+                if settings.update_in_place:
+                    with import_profiler.span("nodes"):
+                        changes = update_material(mat, tfiles, convertnormals=convert, images=images, use_groups=settings.use_node_groups, info=record.info)
+                if changes is None:
+                    mat.user_clear()
+                    mat.name=f"OLD__{len(delete_mats)}"
+                    delete_mats.append(mat)
+                    mat = None
+                elif mark_asset and (changes!=0 or not mat.asset_data or not settings.skip_unchanged_previews):
+                    mark_material_asset(mat, tfiles, previews=preview_queue)
+
+            if mat is None:
+                with import_profiler.span("nodes"):
+                    mat = generate_material(matName, tfiles, markasset=mark_asset, convertnormals=convert, overwrite=overwrite, images=images, use_groups=settings.use_node_groups, previews=preview_queue, info=record.info)
+            if not mat:
+                continue
+            new_mats+=1
+            if manifest:
+                manifest.update(record, mat.name)
+            if mat.asset_data:
+                tags = [settings.tag1, settings.tag2, settings.tag3]
+                if settings.category_tags:
+                    tags.extend(record.category)
+                if settings.resolution_tags and record.info:
+                    tags.append(resolution_tag(info for tkey, info in record.info.items() if tkey!="render"))
+                with import_profiler.span("tags"):
+                    add_asset_tags(mat, tags)
+                    catalog_path = record_catalog(record, settings.catalog_root, mapping) if catalogs else ""
+                    if catalog_path:
+                        mat.asset_data.catalog_id = catalogs.catalog_id(catalog_path)
+            if import_profiler.enabled:
+                size = sum(item[1] for item in record.signature) if record.signature else sum(texture_size(tpath) for tpath in tfiles.values())
+                import_profiler.add_material(mat.name, time.perf_counter_ns()-start_ns, size)
+
+    if manifest and not partial:
+        # materials of deleted folders are removed as well
+        for name in manifest.pop_removed():
+            mat = bpy.data.materials.get(name)
+            if mat and settings.overwrite_materials:
+                delete_mats.append(mat)
+    if manifest:
+        manifest.save()
+    if cache:
+        cache.save()
+    if catalogs:
+        try:
+            catalogs.save()
+        except (OSError, TimeoutError) as e:
+            print(f"Material importer: can't save the asset catalogs: {e}")
+
+    # cleanup because for some reason context loses temp_override when removing materials
+    with import_profiler.span("cleanup"):
+        for mat in delete_mats:
+            mat.user_clear()
+            bpy.data.materials.remove(mat)
+
+    # previews are created after all materials exist
+    preview_queue.start()
+
+    report = None
+    if import_profiler.enabled:
+        # deferred previews run after the import and are not part of the report
+        import_profiler.stop()
+        report_dir = Path(bpy.utils.resource_path(type="USER")) / "config" / "material_import_reports"
+        report = import_profiler.write_report(report_dir, name=f"shard{shard[0]+1}of{shard[1]}" if shard else "import")
+        print(f"Material importer: {import_profiler.summary()}")
+        print(f"Material importer: timing report written to {report}")
+
+    if wm:
+        wm.progress_end()
+    return ImportResult(new_mats, manifest.skipped if manifest else 0, broken_files, dedup.duplicates if dedup else 0, report)
+
 class OLI_OT_import_material_folder(bpy.types.Operator):
     """ Import a whole folder with a subfolder each
     for one material. Tries to assign the textures to
@@ -410,51 +2498,6 @@ class OLI_OT_import_material_folder(bpy.types.Operator):
     # def __init__(self):
     #     pass
 
-    def get_texture_files(self, context, rpath):
-        """ Searches the names of all files in a path for texture keywords
-        Returns a dict of texture paths
-        """
-
-        preferences = context.preferences
-        addon_prefs = preferences.addons[__name__].preferences
-
-        # build filetypes
-        # file_types = [".jpg", ".png", ".tga"]
-        file_types = [f".{key.strip()}" for key in addon_prefs.file_types.split(",")]
-
-        # build keyword dict
-        tex_keywords = dict()
-        tex_keywords["ao"]          =[key.strip() for key in addon_prefs.ao_keys.strip().split(",") if key!=""]
-        tex_keywords["diffuse"]     =[key.strip() for key in addon_prefs.diffuse_keys.strip().split(",") if key!=""]
-        tex_keywords["reflection"]  =[key.strip() for key in addon_prefs.reflection_keys.strip().split(",") if key!=""]
-        tex_keywords["roughness"]   =[key.strip() for key in addon_prefs.roughness_keys.strip().split(",") if key!=""]
-        tex_keywords["metal"]       =[key.strip() for key in addon_prefs.metal_keys.strip().split(",") if key!=""]
-        tex_keywords["emission"]    =[key.strip() for key in addon_prefs.emission_keys.strip().split(",") if key!=""]
-        tex_keywords["normal"]      =[key.strip() for key in addon_prefs.normal_keys.strip().split(",") if key!=""]
-        tex_keywords["height"]      =[key.strip() for key in addon_prefs.height_keys.strip().split(",") if key!=""]
-        tex_keywords["render"]      =[key.strip() for key in addon_prefs.thumbnail_keys.strip().split(",") if key!=""]
-
-        # build file dict
-        tfiles = dict()
-        for tfile in rpath.iterdir():
-            if tfile.is_dir():
-                continue
-            if tfile.suffix not in file_types:
-                continue
-            for tkey, tids in tex_keywords.items():
-                # print(f"Tex Type {tkey} has {len(tids)} keywords")
-                for tid in tids:
-                    if addon_prefs.ignore_case:
-                        if tid.lower() in tfile.stem.lower():
-                            tfiles[tkey]=tfile
-                            break
-                    else:
-                        if tid in tfile.stem:
-                            print(f"Keyword {tid} found in {tfile.stem}")
-                            tfiles[tkey]=tfile
-                            break
-        return tfiles    
-
     def invoke(self, context, _event):
         context.window_manager.fileselect_add(self)
         return {'RUNNING_MODAL'}        
@@ -472,57 +2515,92 @@ class OLI_OT_import_material_folder(bpy.types.Operator):
                 icon='ERROR')
             return {'CANCELLED'}
 
-        wm = context.window_manager
+        addon_prefs = context.preferences.addons[__name__].preferences
+        profile = get_keyword_profile(addon_prefs)
+        settings = context.scene.material_importer_settings
 
-        matPaths = list(p for p in root.iterdir() if p.is_dir())
-        wm.progress_begin(0, len(matPaths))
+        if settings.mark_asset and settings.use_catalogs and not bpy.data.filepath:
+            self.report({'WARNING'}, "Save the blend file first, asset catalogs are stored next to it.")
 
-        new_mats=0
-        delete_mats=[]
+        result = import_material_library(root, settings, profile, wm=context.window_manager)
 
-        for tid, tpath in enumerate(matPaths):
-            tfiles = self.get_texture_files(context, tpath)
-            if len(tfiles)==0:
-                continue
-            matName = tpath.stem.replace("_", " ")
-            mark_asset = context.scene.material_importer_settings.mark_asset
-            convert = context.scene.material_importer_settings.convert_from_directx
-            overwrite = context.scene.material_importer_settings.overwrite_materials
-
-            if bpy.data.materials.find(matName)!=-1:
-                if overwrite:
-                    mat = bpy.data.materials[matName]
-                    mat.user_clear()
-                    mat.name=f"OLD__{len(delete_mats)}"
-                    delete_mats.append(mat)
-                else:
-                    continue
+        if result.broken_files:
+            print("Material importer skipped broken textures:")
+            for line in result.broken_files:
+                print(f"- {line}")
+            self.report({'WARNING'}, f"{len(result.broken_files)} broken texture files were skipped, see console for details.")
 
-            mat = generate_material(matName, tfiles, markasset=mark_asset, convertnormals=convert, overwrite=overwrite)
-            if not mat:
-                continue
-            new_mats+=1
-            if mat.asset_data:
-                if context.scene.material_importer_settings.tag1!="":
-                    mat.asset_data.tags.new(context.scene.material_importer_settings.tag1)
-                if context.scene.material_importer_settings.tag2!="":
-                    mat.asset_data.tags.new(context.scene.material_importer_settings.tag2)
-                if context.scene.material_importer_settings.tag3!="":
-                    mat.asset_data.tags.new(context.scene.material_importer_settings.tag3)
-            wm.progress_update(tid)
-
-        # cleanup because for some reason context loses temp_override when removing materials
-        for mat in delete_mats:
-            mat.user_clear()
-            bpy.data.materials.remove(mat)
+        if result.duplicates!=0:
+            print(f"Material importer: {result.duplicates} duplicate textures share an image.")
 
-        if new_mats==0:
+        if result.report:
+            self.report({'INFO'}, import_profiler.summary())
+        elif result.skipped!=0:
+            self.report({'INFO'}, f"{result.imported} materials imported, {result.skipped} unchanged materials skipped.")
+        elif result.imported==0:
             bpy.context.window_manager.popup_menu(
                 lambda self, ctx: (self.layout.label(text="No new materials were imported!")) , 
                 title="Warning", 
                 icon='ERROR')
 
-        wm.progress_end()
+        return {'FINISHED'}
+
+class OLI_OT_explain_material_folder(bpy.types.Operator):
+    """ Shows which texture file is used for which map of every material,
+    without importing anything. Prints the table to the console."""
+    bl_idname = "olitools.explain_material_folder"
+    bl_label = "Dry Run"
+
+    filepath: StringProperty()
+    filename:  StringProperty()
+    directory:  StringProperty()
+
+    def invoke(self, context, _event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        root = Path(self.directory)
+        if not root.is_dir():
+            bpy.context.window_manager.popup_menu(
+                lambda self, ctx: (self.layout.label(text="Not a folder.")) , 
+                title="Warning", 
+                icon='ERROR')
+            return {'CANCELLED'}
+
+        addon_prefs = context.preferences.addons[__name__].preferences
+        profile = get_keyword_profile(addon_prefs)
+        records, cache = explain_material_library(root, context.scene.material_importer_settings, profile)
+        lines = explanation_table(records, cache)
+        print("\n".join(lines))
+        self.report({'INFO'}, lines[-1])
+        return {'FINISHED'}
+
+class OLI_OT_watch_material_folder(bpy.types.Operator):
+    """ Watches the library folder and reimports material folders
+    as soon as their textures change."""
+    bl_idname = "olitools.watch_material_folder"
+    bl_label = "Toggle Library Watcher"
+
+    def execute(self, context):
+        settings = context.scene.material_importer_settings
+        if settings.watch_library:
+            settings.watch_library = False
+            return {'FINISHED'}
+
+        root = Path(bpy.path.abspath(settings.path))
+        if settings.path=="" or not root.is_dir():
+            bpy.context.window_manager.popup_menu(
+                lambda self, ctx: (self.layout.label(text="Not a folder.")) , 
+                title="Warning", 
+                icon='ERROR')
+            return {'CANCELLED'}
+
+        settings.watch_library = True
+        library_watcher.start(root)
+        if not bpy.app.timers.is_registered(watch_library_callback):
+            bpy.app.timers.register(watch_library_callback)
+        print(f"Material Library Watcher watching {root}")
         return {'FINISHED'}
 
 class OLI_OT_Debug(bpy.types.Operator):
@@ -533,24 +2611,10 @@ class OLI_OT_Debug(bpy.types.Operator):
     def execute(self, context):
         preferences = context.preferences
         addon_prefs = preferences.addons[__name__].preferences
+        profile = get_keyword_profile(addon_prefs)
 
-        # build filetypes
-        # file_types = [".jpg", ".png", ".tga"]
-        file_types = [f".{key.strip()}" for key in addon_prefs.file_types.split(",")]
-
-        # build keyword dict
-        tex_keywords = dict()
-        tex_keywords["ao"]          =[key.strip() for key in addon_prefs.ao_keys.strip().split(",") if key!=""]
-        tex_keywords["diffuse"]     =[key.strip() for key in addon_prefs.diffuse_keys.strip().split(",") if key!=""]
-        tex_keywords["reflection"]  =[key.strip() for key in addon_prefs.reflection_keys.strip().split(",") if key!=""]
-        tex_keywords["roughness"]   =[key.strip() for key in addon_prefs.roughness_keys.strip().split(",") if key!=""]
-        tex_keywords["metal"]       =[key.strip() for key in addon_prefs.metal_keys.strip().split(",") if key!=""]
-        tex_keywords["emission"]    =[key.strip() for key in addon_prefs.emission_keys.strip().split(",") if key!=""]
-        tex_keywords["normal"]      =[key.strip() for key in addon_prefs.normal_keys.strip().split(",") if key!=""]
-        tex_keywords["height"]      =[key.strip() for key in addon_prefs.height_keys.strip().split(",") if key!=""]
-        tex_keywords["render"]      =[key.strip() for key in addon_prefs.thumbnail_keys.strip().split(",") if key!=""]
-
-        for tkey, tids in tex_keywords.items():
+        print(f"File types: {', '.join(sorted(profile.file_types))}")
+        for tkey, tids in profile.keywords:
             print(f"Tex Type {tkey} has {len(tids)} keywords")
             for tid in tids:
                 print(f"- {tid}")
@@ -585,12 +2649,43 @@ class OLI_PT_import_material_folder(bpy.types.Panel):
         else:
             btext = "Expect OpenGL Normalmaps"
         box.prop(context.scene.material_importer_settings, "convert_from_directx", text=btext)
+        box.prop(context.scene.material_importer_settings, "use_node_groups")
 
         if context.scene.material_importer_settings.overwrite_materials:
             btext = "Existing materials will be overwritten"
         else:
             btext = "Existing materials are maintained."
         box.prop(context.scene.material_importer_settings, "overwrite_materials", text=btext)
+        box.prop(context.scene.material_importer_settings, "update_in_place")
+        box.prop(context.scene.material_importer_settings, "incremental")
+        box.prop(context.scene.material_importer_settings, "skip_unchanged_images")
+        box.prop(context.scene.material_importer_settings, "lazy_images")
+        box.prop(context.scene.material_importer_settings, "deduplicate_textures")
+        box.prop(context.scene.material_importer_settings, "validate_textures")
+        sub = box.column()
+        sub.enabled = context.scene.material_importer_settings.validate_textures
+        sub.prop(context.scene.material_importer_settings, "resolution_tags")
+        box.prop(context.scene.material_importer_settings, "skip_unchanged_previews")
+        box.prop(context.scene.material_importer_settings, "cache_previews")
+        box.prop(context.scene.material_importer_settings, "write_timings")
+
+        col = box.column(align=True)
+        col.label(text="Folders")
+        col.prop(context.scene.material_importer_settings, "recursive")
+        sub = col.column(align=True)
+        sub.enabled = context.scene.material_importer_settings.recursive
+        sub.prop(context.scene.material_importer_settings, "max_depth")
+        sub.prop(context.scene.material_importer_settings, "category_tags")
+        col.prop(context.scene.material_importer_settings, "include_filter")
+        col.prop(context.scene.material_importer_settings, "exclude_filter")
+
+        col = box.column(align=True)
+        col.label(text="Catalogs")
+        col.prop(context.scene.material_importer_settings, "use_catalogs")
+        sub = col.column(align=True)
+        sub.enabled = context.scene.material_importer_settings.use_catalogs
+        sub.prop(context.scene.material_importer_settings, "catalog_root")
+        sub.prop(context.scene.material_importer_settings, "catalog_mapping")
 
         col = box.column(align=True)
         col.label(text="Tags")
@@ -598,7 +2693,15 @@ class OLI_PT_import_material_folder(bpy.types.Panel):
         col.prop(context.scene.material_importer_settings, "tag2", text="2")
         col.prop(context.scene.material_importer_settings, "tag3", text="3")
 
-        self.layout.operator("olitools.import_material_folder", text="Import Materials")
+        row = self.layout.row(align=True)
+        row.operator("olitools.import_material_folder", text="Import Materials")
+        row.operator("olitools.explain_material_folder", text="Dry Run")
+
+        box = self.layout.box()
+        box.prop(context.scene.material_importer_settings, "path")
+        box.operator("olitools.watch_material_folder")
+        status = "Status: " + ("watching" if context.scene.material_importer_settings.watch_library else "inactive")
+        box.label(text=status)
         # self.layout.operator("olitools.debug_test")
 
 blender_classes=[
@@ -608,6 +2711,8 @@ blender_classes=[
     OLI_AP_material_importer_prefs,
     OLI_PG_material_importer_settings,
     OLI_OT_import_material_folder,
+    OLI_OT_explain_material_folder,
+    OLI_OT_watch_material_folder,
     OLI_PT_import_material_folder,
     # OLI_OT_Debug
 ]
@@ -616,13 +2721,137 @@ def register():
     for blender_class in blender_classes:
         bpy.utils.register_class(blender_class)
     bpy.types.Scene.material_importer_settings = PointerProperty(type=OLI_PG_material_importer_settings)
+    bpy.app.handlers.load_post.append(reset_watcher_on_load_callback)
 
 def unregister():
+    if reset_watcher_on_load_callback in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(reset_watcher_on_load_callback)
+    if bpy.app.timers.is_registered(watch_library_callback):
+        bpy.app.timers.unregister(watch_library_callback)
+    if bpy.app.timers.is_registered(preview_queue_callback):
+        bpy.app.timers.unregister(preview_queue_callback)
     del bpy.types.Scene.material_importer_settings
     for blender_class in blender_classes:
         bpy.utils.unregister_class(blender_class)
 
-if __name__ == "__main__":
+# -------------------------------------------------------------
+# Command Line
+# -------------------------------------------------------------
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="blender -b --python import_material_folder.py --",
+        description="Imports a material library into a blend file.")
+    parser.add_argument("root", help="The material library folder")
+    parser.add_argument("-o", "--output", help="The blend file to save. An existing file is updated.")
+    parser.add_argument("--profile", help="Keyword json file as written by 'Save Keywords'. Uses the default keywords if not given.")
+    parser.add_argument("--tag", action="append", default=[], help="Asset tag, can be given up to three times")
+    parser.add_argument("--recursive", action="store_true", help="Search subfolders")
+    parser.add_argument("--max-depth", type=int, default=3, help="Folder levels to search, 0 for all")
+    parser.add_argument("--include", default="", help="Comma-seperated glob patterns of material folders to import")
+    parser.add_argument("--exclude", default="", help="Comma-seperated glob patterns of folders to skip")
+    parser.add_argument("--no-asset", action="store_true", help="Don't mark materials as assets")
+    parser.add_argument("--no-convert", action="store_true", help="Expect OpenGL normal maps")
+    parser.add_argument("--node-groups", action="store_true", help="Build materials from shared node groups")
+    parser.add_argument("--incremental", action="store_true", help="Only import changed folders")
+    parser.add_argument("--dedup", action="store_true", help="Share one image between identical textures")
+    parser.add_argument("--no-validate", action="store_true", help="Don't read the texture headers before import")
+    parser.add_argument("--lazy-images", action="store_true", help="Don't read the images during import, only point them at their files")
+    parser.add_argument("--catalogs", action="store_true", help="Put the materials into asset catalogs named after their folders")
+    parser.add_argument("--catalog-root", default="", help="Catalog path all folder catalogs are put under")
+    parser.add_argument("--catalog-mapping", default="", help="Json file of {\"folder glob\": \"catalog/path\"} pairs")
+    parser.add_argument("--timings", action="store_true", help="Write a timing report of the import phases to the user config folder")
+    parser.add_argument("--dry-run", action="store_true", help="Only print which file is used for which map, don't import anything")
+    parser.add_argument("--new-file", action="store_true", help="Don't open an existing output file, start with an empty one")
+    parser.add_argument("--jobs", type=int, default=1, help="Split the library across this many blender processes, each writing its own blend file")
+    parser.add_argument("--shards", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--shard-index", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if len(args.tag)>3:
+        parser.error("at most three tags are supported")
+    if args.output is None and not args.dry_run:
+        parser.error("the following arguments are required: -o/--output")
+    return args
+
+def shard_output(output, index, count):
+    """Returns the blend file path of one shard, e.g. library_2of4.blend."""
+    path = Path(output)
+    return str(path.with_name(f"{path.stem}_{index+1}of{count}{path.suffix}"))
+
+def run_jobs(argv, args):
+    """Runs one background blender per shard and waits for all of them."""
+    processes = []
+    for index in range(args.jobs):
+        cmds = [bpy.app.binary_path, "-b", "--factory-startup", "--python", __file__, "--"]
+        cmds += argv + ["--jobs", "1", "--shards", str(args.jobs), "--shard-index", str(index)]
+        print(f"Starting shard {index+1} of {args.jobs}")
+        processes.append(subprocess.Popen(cmds))
+    failed = [index+1 for index, process in enumerate(processes) if process.wait()!=0]
+    if failed:
+        print(f"Shards {', '.join(map(str, failed))} failed.")
+        return 1
+    return 0
+
+def apply_arguments(settings, args):
+    """Copies the command line options to the importer settings."""
+    settings.mark_asset = not args.no_asset
+    settings.convert_from_directx = not args.no_convert
+    settings.use_node_groups = args.node_groups
+    settings.recursive = args.recursive
+    settings.max_depth = args.max_depth
+    settings.include_filter = args.include
+    settings.exclude_filter = args.exclude
+    settings.incremental = args.incremental
+    settings.deduplicate_textures = args.dedup
+    settings.validate_textures = not args.no_validate
+    settings.lazy_images = args.lazy_images
+    settings.write_timings = args.timings
+    settings.use_catalogs = args.catalogs
+    settings.catalog_root = args.catalog_root
+    settings.catalog_mapping = args.catalog_mapping
+    for index, tag in enumerate((args.tag + ["", "", ""])[:3]):
+        setattr(settings, f"tag{index+1}", tag)
+
+def main(argv):
+    """ Command line entry point, for building asset libraries without UI:
+    blender -b --python import_material_folder.py -- <root> -o <output.blend> [options]
+    """
+    args = parse_arguments(argv)
+    profile = load_keyword_profile(args.profile) if args.profile else default_keyword_profile()
+    if args.dry_run:
+        settings = bpy.context.scene.material_importer_settings
+        apply_arguments(settings, args)
+        records, cache = explain_material_library(Path(args.root), settings, profile)
+        print("\n".join(explanation_table(records, cache)))
+        return 0
+
+    if args.jobs>1:
+        return run_jobs(argv, args)
+
+    output = args.output
+    shard = None
+    if args.shards>1:
+        shard = (args.shard_index, args.shards)
+        output = shard_output(output, args.shard_index, args.shards)
+
+    if not args.new_file and Path(output).exists():
+        bpy.ops.wm.open_mainfile(filepath=output)
+
+    settings = bpy.context.scene.material_importer_settings
+    apply_arguments(settings, args)
+    result = import_material_library(Path(args.root), settings, profile, shard=shard, catalog_dir=Path(output).resolve().parent)
+
+    for line in result.broken_files:
+        print(f"Broken texture: {line}")
+    print(f"{result.imported} materials imported, {result.skipped} unchanged, {result.duplicates} duplicate textures.")
+    bpy.ops.wm.save_as_mainfile(filepath=output)
+    return 0
+
+if __name__ == "__main__" and bpy.app.background and "--" in sys.argv:
+    register()
+    sys.exit(main(sys.argv[sys.argv.index("--")+1:]))
+
+elif __name__ == "__main__":
     print("------- Unregister...")
     try:
         unregister()
@@ -1,6 +1,12 @@
 # -------------------------------------------------------------
 # Rapid Gamedev Toolchain
 # -------------------------------------------------------------
+# Version 0.5:
+# - Export presets are cached in memory
+# - Parallel export in background blender processes
+# - Unchanged objects are not exported again
+# - Export All with progress, cancelling and a summary
+# - Exports don't change the selection of the whole scene anymore
 # Version 0.4:
 # - Supporting GLTF file format
 # - Export all objects
@@ -20,13 +26,18 @@ bl_info = {
 }
 
 # standard imports
-import json, subprocess, re
+import argparse, hashlib, json, os, shutil, subprocess, sys, re, time
+from array import array
+from collections import deque
 from pathlib import Path
 from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
 from tempfile import gettempdir
 
 # blender
 import bpy
+from bpy.app.handlers import persistent
 from bpy.path import abspath, relpath
 from bpy.types import PropertyGroup, AddonPreferences
 from bpy_extras.io_utils import ExportHelper
@@ -45,12 +56,33 @@ from bpy.props import (
 
 exp_types = ["MESH", "ARMATURE", "EMPTY"]
 
-def select(*objs):
-	bpy.ops.object.select_all(action='DESELECT')
-	bpy.context.view_layer.objects.active = objs[0]
-	for obj in objs:
-		print(f"Selecting {obj.name}")
+def clear_selection():
+	"""Deselects all objects, only touching the selected ones."""
+	for obj in bpy.context.selected_objects:
+		obj.select_set(False)
+
+@contextmanager
+def export_selection(*objs):
+	"""Selects the objects of one export and deselects them afterwards.
+	The FBX exporter reads the selection from the context, which is
+	overridden, the GLTF exporter checks select_get() of every object.
+	Objects selected before are left selected, batches clear the
+	selection once before and restore it once after all exports.
+	"""
+	selected = [obj for obj in objs if not obj.select_get()]
+	for obj in selected:
 		obj.select_set(True)
+	if hasattr(bpy.context, "temp_override"):
+		override = bpy.context.temp_override(selected_objects=list(objs), active_object=objs[0], object=objs[0])
+	else:
+		# blender < 3.2
+		override = nullcontext()
+	try:
+		with override:
+			yield
+	finally:
+		for obj in selected:
+			obj.select_set(False)
 
 def get_hierarchy(*objs):
 	newobjs=[]    
@@ -71,21 +103,311 @@ def has_armature(obj):
             return True
     return False
 
+def get_export_filepath(obj):
+	"""Returns the absolute export path of an object, with the suffix of the current format."""
+	global export_format
+	project_path = Path(bpy.context.scene.toolchain_settings.project_path)
+	object_path = Path(obj.toolchain_settings.export_path)
+	if object_path.suffix!=export_format.current.suffix:
+		object_path=object_path.with_suffix(export_format.current.suffix)
+	return project_path / object_path
+
+def get_export_objects(obj):
+	"""Returns the objects exported with an object: its hierarchy and its armature."""
+	# We want to export the full hierarchy. No idea why that isn't even considered in the exporter itself.
+	if has_armature(obj) and obj.parent and obj.parent.type=="ARMATURE":
+		return [*get_hierarchy(obj), obj.parent]
+	return get_hierarchy(obj)
+
+def export_hierarchy(obj, file_format, object_settings, filepath, center=True, force=True):
+	"""Exports an object with all its children into one file.
+	Returns a list of issues which prevented the export, empty on success,
+	and if the export was skipped because nothing changed since the last one.
+
+	force: Exports even if the fingerprint of the last export matches
+	"""
+	objs = get_export_objects(obj)
+
+	# Check for any export issues.
+	issues = []
+	for cobj in objs:
+		msg = file_format.check_for_export(cobj)
+		if msg!="":
+			issues.append(msg)
+	if len(issues)!=0:
+		return issues, False
+
+	# computed before centering, the root location is left out for centered exports
+	fingerprint = get_export_fingerprint(obj, objs, file_format, object_settings, center)
+	if not force and Path(filepath).exists() and read_fingerprint(filepath)==fingerprint:
+		return issues, True
+
+	if center:
+		ox, oy, oz = obj.location
+		obj.location = 0, 0, 0
+	try:
+		with export_selection(*objs):
+			file_format.export(str(filepath), object_settings)
+	finally:
+		if center:
+			obj.location = ox, oy, oz
+	write_fingerprint(filepath, fingerprint)
+	return issues, False
+
+def get_selection():
+	"""Returns the names of the selected objects and of the active object."""
+	active = bpy.context.view_layer.objects.active
+	return [obj.name for obj in bpy.context.selected_objects], active.name if active else None
+
+def set_selection(selection):
+	"""Restores a selection of get_selection, skipping deleted objects."""
+	names, active = selection
+	clear_selection()
+	for name in names:
+		obj = bpy.data.objects.get(name)
+		if obj:
+			obj.select_set(True)
+	if active in bpy.data.objects:
+		bpy.context.view_layer.objects.active = bpy.data.objects[active]
+
 def update_export_path_suffix():
 	"""Fixes all objects export path suffixes."""
 	global export_format
-	for obj in bpy.context.scene.objects:
+	for obj in export_index.get_objects():
 		if obj.toolchain_settings.export_path=="":
 			continue
 		parts = obj.toolchain_settings.export_path.split(".")
 		obj.toolchain_settings.export_path = parts[0] + export_format.current.suffix
 
+# -----------------------------------------------------------------------
+# Change Detection
+# -----------------------------------------------------------------------
+
+# mesh attribute data type -> property holding its values, values per item, array typecode
+ATTRIBUTE_VALUES = {
+	"FLOAT": ("value", 1, "f"),
+	"INT": ("value", 1, "i"),
+	"INT8": ("value", 1, "i"),
+	"BOOLEAN": ("value", 1, "i"),
+	"FLOAT2": ("vector", 2, "f"),
+	"FLOAT_VECTOR": ("vector", 3, "f"),
+	"FLOAT_COLOR": ("color", 4, "f"),
+	"BYTE_COLOR": ("color", 4, "f"),
+	"QUATERNION": ("value", 4, "f"),
+}
+
+# properties which only change the ui, not the exported data
+UI_PROPERTIES = {"rna_type", "show_expanded", "is_active", "show_in_editmode", "show_on_cage", "is_override_data", "select", "active",
+	"location", "width", "height", "dimensions", "width_hidden", "hide", "show_options", "show_preview", "show_texture", "use_custom_color"}
+
+# export settings applying the modifiers of meshes
+APPLY_MODIFIERS = ("use_mesh_modifiers", "export_apply")
+
+def hash_collection(digest, collection, attr, size, typecode="f"):
+	"""Adds one property of all items of a bpy collection to a hash, using foreach_get."""
+	values = array(typecode, [0]) * (len(collection)*size)
+	collection.foreach_get(attr, values)
+	digest.update(values.tobytes())
+
+def hash_value(value):
+	"""Makes a bpy property value hashable the same way in every session."""
+	if isinstance(value, bpy.types.ID):
+		# images are written as paths
+		return f"{value.name}:{getattr(value, 'filepath', '')}"
+	if isinstance(value, set):
+		# enum flags
+		return tuple(sorted(value))
+	if hasattr(value, "to_dict"):
+		return repr(sorted(value.to_dict().items()))
+	if hasattr(value, "__len__") and not isinstance(value, str):
+		return tuple(hash_value(item) for item in value)
+	if isinstance(value, bpy.types.bpy_struct):
+		return getattr(value, "name", None)
+	return value
+
+@lru_cache(maxsize=1)
+def get_id_properties():
+	"""Identifiers of the properties every ID has, like users and session_uid."""
+	return {prop.identifier for prop in bpy.types.ID.bl_rna.properties}
+
+def hash_rna(digest, struct):
+	"""Adds the user editable properties of a bpy struct to a hash, pointers by name.
+	Read-only and ID properties are left out, they change with every session.
+	"""
+	id_properties = get_id_properties()
+	for prop in struct.bl_rna.properties:
+		if prop.identifier in UI_PROPERTIES or prop.identifier in id_properties or prop.type=="COLLECTION" or prop.is_readonly:
+			continue
+		value = hash_value(getattr(struct, prop.identifier, None))
+		digest.update(f"{prop.identifier}={value};".encode("utf-8"))
+
+def hash_id_properties(digest, struct):
+	"""Adds the custom properties of a struct, e.g. geometry nodes modifier inputs."""
+	for key in sorted(struct.keys()):
+		digest.update(f"{key}={hash_value(struct[key])};".encode("utf-8"))
+
+def hash_node_tree(digest, tree, hashed):
+	"""Adds nodes, unlinked socket values and links of a node tree, including its node groups."""
+	if tree is None or tree.name in hashed:
+		return
+	hashed.add(tree.name)
+	digest.update(f"tree:{tree.name}".encode("utf-8"))
+	for node in sorted(tree.nodes, key=lambda node: node.name):
+		hash_rna(digest, node)
+		for socket in node.inputs:
+			if not socket.is_linked and hasattr(socket, "default_value"):
+				digest.update(f"{socket.identifier}={hash_value(socket.default_value)};".encode("utf-8"))
+		if getattr(node, "node_tree", None):
+			hash_node_tree(digest, node.node_tree, hashed)
+	links = sorted(f"{link.from_node.name}:{link.from_socket.identifier}>{link.to_node.name}:{link.to_socket.identifier}" for link in tree.links)
+	digest.update(";".join(links).encode("utf-8"))
+
+def hash_material(digest, material, hashed):
+	if material is None or material.name in hashed:
+		return
+	hashed.add(material.name)
+	hash_rna(digest, material)
+	if material.use_nodes:
+		hash_node_tree(digest, material.node_tree, hashed)
+
+def hash_vertex_groups(digest, obj, mesh):
+	"""Adds the vertex group names and the deform weights, which aren't mesh attributes."""
+	digest.update(";".join(group.name for group in obj.vertex_groups).encode("utf-8"))
+	if not obj.vertex_groups:
+		return
+	groups = array("i")
+	weights = array("f")
+	for vertex in mesh.vertices:
+		groups.append(len(vertex.groups))
+		for element in vertex.groups:
+			groups.append(element.group)
+			weights.append(element.weight)
+	digest.update(groups.tobytes())
+	digest.update(weights.tobytes())
+
+def has_modifiers_applied(obj, object_settings):
+	if not any(object_settings.get(setting) for setting in APPLY_MODIFIERS):
+		return False
+	# armature deformation isn't applied
+	return any(mod.show_viewport and mod.type!="ARMATURE" for mod in obj.modifiers)
+
+def hash_mesh(digest, mesh):
+	hash_collection(digest, mesh.vertices, "co", 3)
+	hash_collection(digest, mesh.edges, "vertices", 2, "i")
+	hash_collection(digest, mesh.loops, "vertex_index", 1, "i")
+	hash_collection(digest, mesh.polygons, "loop_total", 1, "i")
+	hash_collection(digest, mesh.polygons, "material_index", 1, "i")
+	hash_collection(digest, mesh.polygons, "use_smooth", 1, "i")
+	for uv_layer in mesh.uv_layers:
+		digest.update(uv_layer.name.encode("utf-8"))
+		hash_collection(digest, uv_layer.data, "uv", 2)
+	for attribute in mesh.attributes:
+		# internal attributes like the selection start with a dot
+		if attribute.name.startswith(".") or attribute.data_type not in ATTRIBUTE_VALUES:
+			continue
+		attr, size, typecode = ATTRIBUTE_VALUES[attribute.data_type]
+		digest.update(f"{attribute.name}:{attribute.domain}".encode("utf-8"))
+		hash_collection(digest, attribute.data, attr, size, typecode)
+	if mesh.shape_keys:
+		for key_block in mesh.shape_keys.key_blocks:
+			digest.update(f"{key_block.name}:{key_block.value}".encode("utf-8"))
+			hash_collection(digest, key_block.data, "co", 3)
+
+def hash_action(digest, action):
+	digest.update(action.name.encode("utf-8"))
+	for fcurve in action.fcurves:
+		digest.update(f"{fcurve.data_path}[{fcurve.array_index}]".encode("utf-8"))
+		hash_collection(digest, fcurve.keyframe_points, "co", 2)
+		hash_collection(digest, fcurve.keyframe_points, "handle_left", 2)
+		hash_collection(digest, fcurve.keyframe_points, "handle_right", 2)
+
+def get_export_fingerprint(root, objs, file_format, object_settings, center=True):
+	"""Hashes everything that ends up in an export file: mesh data (evaluated
+	if modifiers are applied), vertex weights, transforms, modifiers,
+	material node trees, actions and the export settings. Meshes are
+	read with foreach_get, so this is much cheaper than an export.
+	"""
+	digest = hashlib.blake2b(digest_size=16)
+	digest.update(file_format.id.encode("utf-8"))
+	digest.update(json.dumps(object_settings, sort_keys=True, default=sorted).encode("utf-8"))
+	actions = set()
+	# names of the hashed materials and node trees, shared between objects
+	hashed = set()
+	for obj in sorted(objs, key=lambda obj: obj.name):
+		digest.update(f"{obj.name}:{obj.type}:{obj.parent.name if obj.parent else ''}".encode("utf-8"))
+		matrix = obj.matrix_world.to_3x3() if obj==root and center else obj.matrix_world
+		if obj!=root and root.parent!=obj:
+			matrix = obj.matrix_local
+		digest.update(repr([tuple(row) for row in matrix]).encode("utf-8"))
+		for mod in obj.modifiers:
+			hash_rna(digest, mod)
+			hash_id_properties(digest, mod)
+		for slot in obj.material_slots:
+			digest.update(f"material:{slot.link}:{slot.material.name if slot.material else ''}".encode("utf-8"))
+			hash_material(digest, slot.material, hashed)
+		if obj.type=="MESH":
+			if has_modifiers_applied(obj, object_settings):
+				# the evaluated mesh also covers node trees and objects used by modifiers, e.g. boolean cutters
+				evaluated = obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
+				mesh = evaluated.to_mesh()
+				try:
+					hash_mesh(digest, mesh)
+					hash_vertex_groups(digest, obj, mesh)
+				finally:
+					evaluated.to_mesh_clear()
+			else:
+				hash_mesh(digest, obj.data)
+				hash_vertex_groups(digest, obj, obj.data)
+		elif obj.type=="ARMATURE":
+			for bone in obj.data.bones:
+				digest.update(f"{bone.name}:{bone.parent.name if bone.parent else ''}".encode("utf-8"))
+				digest.update(repr([tuple(row) for row in bone.matrix_local]).encode("utf-8"))
+				digest.update(repr((tuple(bone.head_local), tuple(bone.tail_local))).encode("utf-8"))
+		if obj.animation_data:
+			if obj.animation_data.action:
+				actions.add(obj.animation_data.action)
+			for track in obj.animation_data.nla_tracks:
+				for strip in track.strips:
+					hash_rna(digest, strip)
+					if strip.action:
+						actions.add(strip.action)
+	# the fbx exporter can bake all actions of the file
+	if object_settings.get("bake_anim_use_all_actions"):
+		actions.update(bpy.data.actions)
+	for action in sorted(actions, key=lambda action: action.name):
+		hash_action(digest, action)
+	return digest.hexdigest()
+
+def get_fingerprint_path(filepath):
+	"""The hidden sidecar file next to an export, e.g. .Crate.fbx.rgt.json"""
+	filepath = Path(filepath)
+	return filepath.with_name(f".{filepath.name}.rgt.json")
+
+def read_fingerprint(filepath):
+	try:
+		with open(get_fingerprint_path(filepath)) as jsonfile:
+			return json.load(jsonfile).get("fingerprint")
+	except (OSError, ValueError, AttributeError):
+		return None
+
+def write_fingerprint(filepath, fingerprint):
+	try:
+		with open(get_fingerprint_path(filepath), "w") as jsonfile:
+			json.dump({"fingerprint": fingerprint}, jsonfile)
+	except OSError as e:
+		print(f"Can't write fingerprint of {filepath}: {e}")
+
 # -----------------------------------------------------------------------
 # Format Abstract class
 # -----------------------------------------------------------------------
 
 class File_format(ABC):
 
+	settings_file = ""
+
+	def get_settings_path(self):
+		return Path(bpy.utils.resource_path(type="USER")) / "config" / self.settings_file
+
 	@abstractmethod
 	def get_default_settings(self):
 		return {}
@@ -116,6 +438,7 @@ class FBX_file_format(File_format):
 		super().__init__( *args, **kwargs )
 		self.suffix = ".fbx"
 		self.id = "FBX"
+		self.settings_file = "ot_fbx_settings.json"
 
 	def get_default_settings(self):
 		return {
@@ -159,20 +482,20 @@ class FBX_file_format(File_format):
 	def save_settings(self, settings = None):
 		"""Saves the fbx export settings. If none are given, it saves default settings."""
 		global export_format
-		cPath=Path(bpy.utils.resource_path(type="USER")) / "config"
+		cPath=self.get_settings_path()
 
 		if settings == None:
 			settings = dict()
 			settings["default"] = export_format.current.get_default_settings()
 			settings["default"]["object_types"]=list(settings["default"]["object_types"])
 
-		with open(cPath / "ot_fbx_settings.json", "w") as jsonfile:
+		with open(cPath, "w") as jsonfile:
 			json.dump(settings, jsonfile, indent=2)
 
 	def load_settings(self):
 		"""Loads the fbx export settings. If none are found, it creates default settings"""
 		global export_format
-		cPath=Path(bpy.utils.resource_path(type="USER")) / "config" / "ot_fbx_settings.json"
+		cPath=self.get_settings_path()
 
 		if not cPath.exists():
 			export_format.current.save_settings() # save defaults
@@ -210,6 +533,7 @@ class GLTF_file_format(File_format):
 		super().__init__( *args, **kwargs )
 		self.suffix = ".gltf"
 		self.id = "GLTF"
+		self.settings_file = "ot_gltf_settings.json"
 
 	def get_default_settings(self):
 		return {
@@ -288,19 +612,19 @@ class GLTF_file_format(File_format):
 	def save_settings(self, settings = None):
 		"""Saves the fbx export settings. If none are given, it saves default settings."""
 		global export_format
-		cPath=Path(bpy.utils.resource_path(type="USER")) / "config"
+		cPath=self.get_settings_path()
 
 		if settings == None:
 			settings = dict()
 			settings["default"] = export_format.current.get_default_settings()
 
-		with open(cPath / "ot_gltf_settings.json", "w") as jsonfile:
+		with open(cPath, "w") as jsonfile:
 			json.dump(settings, jsonfile, indent=2)
 
 	def load_settings(self):
 		"""Loads the fbx export settings. If none are found, it creates default settings"""
 		global export_format
-		cPath=Path(bpy.utils.resource_path(type="USER")) / "config" / "ot_gltf_settings.json"
+		cPath=self.get_settings_path()
 
 		if not cPath.exists():
 			export_format.current.save_settings() # save defaults
@@ -335,6 +659,273 @@ class ExportFormatManager:
 
 export_format = ExportFormatManager()
 
+class ExportSettingsStore:
+	"""Keeps the parsed export presets of every format in memory.
+	A preset file is only read again if its modification time changed,
+	so drawing the panel doesn't parse any json. The enum items are
+	stored too, blender needs them to stay referenced.
+	"""
+
+	def __init__(self):
+		# settings path -> (mtime, settings, enum items)
+		self.entries = dict()
+
+	def get_entry(self, file_format):
+		path = file_format.get_settings_path()
+		try:
+			mtime = os.stat(path).st_mtime_ns
+		except OSError:
+			mtime = None
+		entry = self.entries.get(path)
+		if entry is None or mtime is None or entry[0]!=mtime:
+			settings = file_format.load_settings()
+			# load_settings writes the defaults if there is no file yet
+			mtime = os.stat(path).st_mtime_ns
+			entry = (mtime, settings, [(key, key, "") for key in settings])
+			self.entries[path] = entry
+		return entry
+
+	def get(self, file_format):
+		"""Returns the presets of a format. The dict is shared, don't change it."""
+		return self.get_entry(file_format)[1]
+
+	def items(self, file_format):
+		return self.get_entry(file_format)[2]
+
+export_settings_store = ExportSettingsStore()
+
+class ExportIndex:
+	"""Names of all objects with an export path, so finding them needs no
+	scan of the file. Objects are added by the update callback of their
+	export path. If objects were added or removed in other ways, e.g. by
+	duplicating or renaming, the index is rebuilt with a single scan.
+	"""
+
+	def __init__(self):
+		self.names = set()
+		self.object_count = -1
+
+	def invalidate(self):
+		self.object_count = -1
+
+	def add(self, obj):
+		self.names.add(obj.name)
+
+	def rebuild(self):
+		self.names = {obj.name for obj in bpy.data.objects if obj.toolchain_settings.export_path!=""}
+		self.object_count = len(bpy.data.objects)
+
+	def get_objects(self):
+		"""Returns all objects with an export path, sorted by name."""
+		if self.object_count!=len(bpy.data.objects):
+			self.rebuild()
+		objs = [bpy.data.objects.get(name) for name in self.names]
+		if None in objs:
+			# renamed objects
+			self.rebuild()
+			objs = [bpy.data.objects[name] for name in self.names]
+		return sorted((obj for obj in objs if obj.toolchain_settings.export_path!=""), key=lambda obj: obj.name)
+
+export_index = ExportIndex()
+
+@persistent
+def invalidate_export_index_callback(scene):
+	export_index.invalidate()
+
+def get_depth(obj):
+	depth = 0
+	while obj.parent:
+		obj = obj.parent
+		depth+=1
+	return depth
+
+def build_export_queue(objs):
+	"""Orders export jobs parents first. Returns (object, filepath, error)
+	tuples, objects exporting to the file of an earlier one get an error.
+	"""
+	jobs = []
+	filepaths = dict()
+	for obj in sorted(objs, key=lambda obj: (get_depth(obj), obj.name)):
+		filepath = get_export_filepath(obj)
+		key = os.path.normcase(str(filepath))
+		if key in filepaths:
+			jobs.append((obj, filepath, f"- {obj.name} exports to the same file as {filepaths[key]}."))
+			continue
+		filepaths[key] = obj.name
+		jobs.append((obj, filepath, ""))
+	return jobs
+
+# -----------------------------------------------------------------------
+# Parallel Export
+# -----------------------------------------------------------------------
+
+class ParallelExport:
+	"""Exports objects in background blender processes.
+	The current file is saved as a snapshot, so unsaved changes are
+	exported too. All workers open the snapshot and share one list of
+	jobs, one job per object hierarchy. A worker claims the next free
+	job with a claim file, so a slow job doesn't hold up the others.
+	start() doesn't block, poll() reads the results written so far and
+	wait() blocks until all workers are done.
+	"""
+
+	def __init__(self, workers=4):
+		self.workers = workers
+		self.jobs = []
+		self.running = []
+		# worker process id -> exit code of finished workers
+		self.returncodes = dict()
+		# results path -> (modification time, results written so far)
+		self.partial = dict()
+		# one dict per job with object, filepath, error and seconds
+		self.results = []
+		self.cancelled = False
+		self.temp_dir = None
+
+	def add(self, obj, force=True):
+		global export_format
+		settings = export_settings_store.get(export_format.current)
+		settings_name = obj.toolchain_settings.export_settings
+		if settings_name not in settings:
+			settings_name = "default"
+		object_settings = dict(settings[settings_name])
+		if "object_types" in object_settings:
+			object_settings["object_types"] = list(object_settings["object_types"])
+		self.jobs.append({
+			"object": obj.name,
+			"filepath": str(get_export_filepath(obj)),
+			"format": export_format.current.id,
+			"settings": object_settings,
+			"center": obj.toolchain_settings.center,
+			"force": force,
+			})
+
+	def start(self):
+		self.temp_dir = Path(gettempdir()) / f"rgt_export_{os.getpid()}_{int(time.time())}"
+		claims_dir = self.temp_dir / "claims"
+		claims_dir.mkdir(parents=True, exist_ok=True)
+		snapshot = self.temp_dir / "snapshot.blend"
+		bpy.ops.wm.save_as_mainfile(filepath=str(snapshot), copy=True)
+
+		jobs_path = self.temp_dir / "jobs.json"
+		with open(jobs_path, "w") as jsonfile:
+			json.dump(self.jobs, jsonfile)
+		count = min(self.workers, len(self.jobs))
+		print(f"Starting {count} export workers for {len(self.jobs)} objects")
+		for index in range(count):
+			results_path = self.temp_dir / f"results_{index}.json"
+			cmds = [bpy.app.binary_path, "-b", str(snapshot), "--factory-startup", "--python", __file__, "--"]
+			cmds += ["--jobs", str(jobs_path), "--results", str(results_path), "--claims", str(claims_dir)]
+			self.running.append((subprocess.Popen(cmds), results_path))
+			self.partial[results_path] = (None, [])
+
+	def read_results(self, results_path):
+		"""Reads the results a worker wrote so far, only if the file changed."""
+		try:
+			mtime = results_path.stat().st_mtime_ns
+			if mtime!=self.partial[results_path][0]:
+				with open(results_path) as jsonfile:
+					self.partial[results_path] = (mtime, json.load(jsonfile))
+		except (OSError, ValueError):
+			# not written yet, or being replaced
+			pass
+
+	@property
+	def done(self):
+		"""Number of jobs finished so far."""
+		return sum(len(results) for _, results in self.partial.values())
+
+	def collect(self):
+		"""Gathers the results of all workers, jobs without one were cancelled or their worker failed."""
+		self.results = [result for _, results in self.partial.values() for result in results]
+		finished = {result["object"] for result in self.results}
+		for index, job in enumerate(self.jobs):
+			if job["object"] in finished:
+				continue
+			error = "cancelled"
+			if not self.cancelled:
+				try:
+					pid = int((self.temp_dir / "claims" / str(index)).read_text())
+					error = f"export worker failed with code {self.returncodes.get(pid)}"
+				except (OSError, ValueError):
+					error = "not exported, all export workers failed"
+			self.results.append({"object": job["object"], "filepath": job["filepath"], "error": error, "skipped": False, "seconds": 0.0})
+
+	def poll(self):
+		"""Reads the results written so far. Returns True if all workers are done."""
+		for worker in list(self.running):
+			process, results_path = worker
+			if process.poll() is not None:
+				self.running.remove(worker)
+				self.returncodes[process.pid] = process.returncode
+			self.read_results(results_path)
+		if not self.running and self.temp_dir:
+			self.collect()
+			shutil.rmtree(self.temp_dir, ignore_errors=True)
+			self.temp_dir = None
+		return not self.running
+
+	def wait(self):
+		for process, _ in self.running:
+			process.wait()
+		self.poll()
+
+	def cancel(self):
+		self.cancelled = True
+		for process, _ in self.running:
+			process.kill()
+		self.wait()
+
+	def get_failed(self):
+		return [result for result in self.results if result["error"]]
+
+def claim_job(claims_dir, index):
+	"""Claims a job for this worker. Returns False if another worker has it."""
+	try:
+		claim = os.open(Path(claims_dir) / str(index), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+	except FileExistsError:
+		return False
+	os.write(claim, str(os.getpid()).encode("utf-8"))
+	os.close(claim)
+	return True
+
+def run_export_jobs(jobs_path, results_path, claims_dir=None):
+	"""Worker side of ParallelExport, exports the jobs of a json file.
+	With a claims folder, only jobs not claimed by another worker are exported.
+	"""
+	with open(jobs_path) as jsonfile:
+		jobs = json.load(jsonfile)
+	# the snapshot keeps the selection of the user
+	clear_selection()
+	results = []
+	for index, job in enumerate(jobs):
+		if claims_dir and not claim_job(claims_dir, index):
+			continue
+		start = time.perf_counter()
+		obj = bpy.data.objects.get(job["object"])
+		error = ""
+		skipped = False
+		if obj is None:
+			error = f"- {job['object']} not found."
+		else:
+			object_settings = dict(job["settings"])
+			if "object_types" in object_settings:
+				object_settings["object_types"] = set(object_settings["object_types"])
+			try:
+				issues, skipped = export_hierarchy(obj, export_format.existing_formats[job["format"]], object_settings, job["filepath"], job["center"], force=job["force"])
+				error = "\n".join(issues)
+			except Exception as e:
+				error = str(e)
+		print(f"Exported {job['object']}" if error=="" else f"Export of {job['object']} failed: {error}")
+		results.append({"object": job["object"], "filepath": job["filepath"], "error": error, "skipped": skipped, "seconds": time.perf_counter()-start})
+		# written after every job, so a crash keeps the finished ones and
+		# the progress can be read; replaced at once, so it's never half written
+		tmp_path = f"{results_path}.tmp"
+		with open(tmp_path, "w") as jsonfile:
+			json.dump(results, jsonfile)
+		os.replace(tmp_path, results_path)
+	return 0
+
 # -----------------------------------------------------------------------
 # Addon Settings
 # -----------------------------------------------------------------------
@@ -415,6 +1006,19 @@ class OLI_PG_export_directory_settings(PropertyGroup):
 		maxlen=0
 	)
 
+	skip_unchanged: bpy.props.BoolProperty(
+		name="Skip Unchanged",
+		default=True,
+		description="Don't export objects whose data and settings didn't change since their last export. A hidden .rgt.json file next to the export remembers them."
+	)
+
+	export_workers: bpy.props.IntProperty(
+		name="Export Workers",
+		default=1,
+		min=1, max=32,
+		description="Export selected objects in this many background blender processes. 1 exports one after another in this blender."
+	)
+
 	uv_resolution: bpy.props.IntProperty(
 		name="UV resolution",
 		default=2048,
@@ -431,6 +1035,7 @@ class OLI_PG_export_object_settings(PropertyGroup):
 	# Issues with PropertyGroup and setters?! No idea.
 	def update_obj_export_path(self, context):
 		global export_format
+		export_index.add(self.id_data)
 		if self['export_path'] =="":
 			return
 		obj_path = Path(self['export_path'])
@@ -446,8 +1051,7 @@ class OLI_PG_export_object_settings(PropertyGroup):
 
 	def settings_callback(self, context):
 		global export_format
-		items = [(key, key, "") for key, item in export_format.current.load_settings().items()]
-		return items
+		return export_settings_store.items(export_format.current)
 
 	export_path: bpy.props.StringProperty(
 		name="Export Path",
@@ -568,6 +1172,12 @@ class OLI_OT_export_to_directory(bpy.types.Operator):
 	bl_idname = "export.to_directory"
 	bl_label = "Exports object to a set filepath with defined settings."
 
+	force: BoolProperty(
+		name="Force",
+		default=False,
+		description="Export even if nothing changed since the last export."
+	)
+
 	@classmethod
 	def poll(cls, context):
 		if context.scene.toolchain_settings.project_path=="":
@@ -582,11 +1192,8 @@ class OLI_OT_export_to_directory(bpy.types.Operator):
 
 	def execute(self, context):
 		global export_format
-		settings = export_format.current.load_settings()
-		project_path = Path(context.scene.toolchain_settings.project_path)
-		object_path = Path(context.active_object.toolchain_settings.export_path)
-		if object_path.suffix!=export_format.current.suffix:
-			object_path=object_path.with_suffix(export_format.current.suffix)
+		settings = export_settings_store.get(export_format.current)
+		object_path = get_export_filepath(context.active_object)
 		object_settings = context.active_object.toolchain_settings.export_settings
 		if object_settings not in settings:
 			bpy.context.window_manager.popup_menu(
@@ -597,47 +1204,28 @@ class OLI_OT_export_to_directory(bpy.types.Operator):
 			object_settings = "default"
 
 		center = context.active_object.toolchain_settings.center
-
-		# We want to export the full hierarchy. No idea why that isn't even considered in the exporter itself.
 		obj = context.active_object
 
-		if has_armature(obj) and obj.parent and obj.parent.type=="ARMATURE":
-			select(*get_hierarchy(obj), obj.parent)
-		else:
-			select(*get_hierarchy(obj))
-
-		# Check for any export issues.
-		issues = []
-		for cobj in context.selected_objects:
-			msg = export_format.current.check_for_export(cobj)
-			if msg!="":
-				issues+=msg
-		if len(issues)!=0:
-			bpy.context.window_manager.popup_menu(
-				lambda self, ctx: (self.layout.label(text="\n".join(issues))) , 
-				title="Export unsuccessful because following problems were found:", 
-				icon='ERROR')
-			return {"CANCELLED"}
-
-		if center:
-			ox, oy, oz = obj.location
-			obj.location = 0, 0, 0		
-
-		res = export_format.current.export(str(project_path / object_path), settings[object_settings])
+		force = self.force or not context.scene.toolchain_settings.skip_unchanged
 		try:
-			pass
-			# bpy.ops.export_scene.fbx(filepath=str(project_path / object_path), **settings[object_settings])
+			issues, skipped = export_hierarchy(obj, export_format.current, settings[object_settings], object_path, center, force=force)
 		except Exception as e:
 			bpy.context.window_manager.popup_menu(
 				lambda self, ctx: (self.layout.label(text=str(e))) , 
 				title=f"Error exporting '{object_path.name}'", 
 				icon='ERROR')
-			if center:
-				obj.location = ox, oy, oz
 			return {"CANCELLED"}
 
-		if center:
-			obj.location = ox, oy, oz
+		if len(issues)!=0:
+			bpy.context.window_manager.popup_menu(
+				lambda self, ctx: (self.layout.label(text="\n".join(issues))) , 
+				title="Export unsuccessful because following problems were found:", 
+				icon='ERROR')
+			return {"CANCELLED"}
+
+		if skipped:
+			self.report({'INFO'}, f"'{object_path.name}' is unchanged since the last export.")
+			return {'FINISHED'}
 
 		bpy.context.window_manager.popup_menu(
 			lambda self, ctx: (self.layout.label(text=f"Export of '{object_path.name}' was successful.")) , 
@@ -651,19 +1239,210 @@ class OLI_OT_export_selected_to_directory(bpy.types.Operator):
 	bl_idname = "export.export_selected_to_directory"
 	bl_label = "Exports selected objects into their direcotries"
 
+	force: BoolProperty(
+		name="Force",
+		default=False,
+		description="Export even if nothing changed since the last export."
+	)
+
+	def get_export_objects(self, context):
+		return [obj for obj in context.selected_objects if obj.toolchain_settings.export_path!=""]
+
+	def start_parallel(self, context, objs, workers):
+		engine = ParallelExport(workers)
+		force = self.force or not context.scene.toolchain_settings.skip_unchanged
+		for obj in objs:
+			engine.add(obj, force=force)
+		engine.start()
+		return engine
+
+	def invoke(self, context, event):
+		export_objs = self.get_export_objects(context)
+		workers = context.scene.toolchain_settings.export_workers
+		if workers<=1 or len(export_objs)<=1:
+			return self.execute(context)
+
+		# the workers are polled by a timer, so the ui isn't blocked
+		self.total = len(export_objs)
+		self.engine = self.start_parallel(context, export_objs, workers)
+		context.window_manager.progress_begin(0, self.total)
+		self.timer = context.window_manager.event_timer_add(0.1, window=context.window)
+		context.window_manager.modal_handler_add(self)
+		return {'RUNNING_MODAL'}
+
+	def modal(self, context, event):
+		if event.type=='ESC':
+			self.engine.cancel()
+			return self.finish(context, cancelled=True)
+		if event.type!='TIMER':
+			return {'PASS_THROUGH'}
+		if self.engine.poll():
+			return self.finish(context)
+		context.window_manager.progress_update(self.engine.done)
+		return {'RUNNING_MODAL'}
+
+	def finish(self, context, cancelled=False):
+		context.window_manager.event_timer_remove(self.timer)
+		context.window_manager.progress_end()
+		self.report_results(self.engine)
+		return {'CANCELLED'} if cancelled else {'FINISHED'}
+
 	def execute(self, context):
-		temp_sel = list(context.selected_objects)
-		for obj in temp_sel:
-			if obj.toolchain_settings.export_path=="":
-				continue
-			select(obj)
-			print(f"Exporting {obj.name}...")
-			res = bpy.ops.export.to_directory()
-			if res!={'FINISHED'}:
-				return res
-		select(*temp_sel)
+		export_objs = self.get_export_objects(context)
+		workers = context.scene.toolchain_settings.export_workers
+		if workers>1 and len(export_objs)>1:
+			engine = self.start_parallel(context, export_objs, workers)
+			engine.wait()
+			self.report_results(engine)
+			return {'FINISHED'}
+
+		selection = get_selection()
+		clear_selection()
+		try:
+			for obj in export_objs:
+				obj.select_set(True)
+				context.view_layer.objects.active = obj
+				res = bpy.ops.export.to_directory(force=self.force)
+				obj.select_set(False)
+				if res!={'FINISHED'}:
+					return res
+		finally:
+			set_selection(selection)
 		return {'FINISHED'}
 
+	def report_results(self, engine):
+		for result in engine.results:
+			status = "failed: " + result["error"] if result["error"] else ("unchanged" if result.get("skipped") else "ok")
+			print(f"{result['object']}: {status} ({result['seconds']:.1f}s)")
+		failed = engine.get_failed()
+		if failed:
+			bpy.context.window_manager.popup_menu(
+				lambda self, ctx: [self.layout.label(text=f"{result['object']}: {result['error']}") for result in failed] , 
+				title=f"{len(failed)} of {len(engine.results)} exports failed", 
+				icon='ERROR')
+			return
+		self.report({'INFO'}, f"{len(engine.results)} objects exported.")
+
+class OLI_OT_export_all_to_directory(bpy.types.Operator):
+	"""Exports all objects with an export path. Esc cancels."""
+	bl_idname = "export.export_all_to_directory"
+	bl_label = "Exports all objects into their directories"
+
+	force: BoolProperty(
+		name="Force",
+		default=False,
+		description="Export even if nothing changed since the last export."
+	)
+
+	@classmethod
+	def poll(cls, context):
+		return context.scene.toolchain_settings.project_path!=""
+
+	def invoke(self, context, event):
+		global export_format
+		objs = [obj for obj in export_index.get_objects() if obj.name in context.scene.objects]
+		if not objs:
+			self.report({'WARNING'}, "No object has an export path.")
+			return {'CANCELLED'}
+
+		self.force = self.force or not context.scene.toolchain_settings.skip_unchanged
+		self.selection = get_selection()
+		clear_selection()
+		self.results = []
+		self.queue = deque()
+		for obj, filepath, error in build_export_queue(objs):
+			if error:
+				self.results.append({"object": obj.name, "filepath": str(filepath), "error": error, "skipped": False, "seconds": 0.0})
+			else:
+				self.queue.append(obj.name)
+		self.total = len(self.results) + len(self.queue)
+		self.start = time.perf_counter()
+
+		self.engine = None
+		workers = context.scene.toolchain_settings.export_workers
+		if workers>1 and len(self.queue)>1:
+			self.engine = ParallelExport(workers)
+			for name in self.queue:
+				self.engine.add(bpy.data.objects[name], force=self.force)
+			self.queue.clear()
+			self.engine.start()
+
+		context.window_manager.progress_begin(0, self.total)
+		self.timer = context.window_manager.event_timer_add(0.05, window=context.window)
+		context.window_manager.modal_handler_add(self)
+		return {'RUNNING_MODAL'}
+
+	def export_next(self, context):
+		global export_format
+		name = self.queue.popleft()
+		obj = bpy.data.objects.get(name)
+		start = time.perf_counter()
+		result = {"object": name, "filepath": "", "error": "", "skipped": False, "seconds": 0.0}
+		if obj is None:
+			result["error"] = f"- {name} was deleted."
+		else:
+			settings = export_settings_store.get(export_format.current)
+			settings_name = obj.toolchain_settings.export_settings
+			if settings_name not in settings:
+				settings_name = "default"
+			filepath = get_export_filepath(obj)
+			result["filepath"] = str(filepath)
+			try:
+				issues, result["skipped"] = export_hierarchy(obj, export_format.current, settings[settings_name], filepath, obj.toolchain_settings.center, force=self.force)
+				result["error"] = "\n".join(issues)
+			except Exception as e:
+				result["error"] = str(e)
+		result["seconds"] = time.perf_counter() - start
+		self.results.append(result)
+
+	def modal(self, context, event):
+		if event.type=='ESC':
+			return self.finish(context, cancelled=True)
+		if event.type!='TIMER':
+			return {'PASS_THROUGH'}
+
+		if self.engine:
+			if self.engine.poll():
+				self.results.extend(self.engine.results)
+				return self.finish(context)
+			done = len(self.results) + self.engine.done
+		else:
+			if self.queue:
+				self.export_next(context)
+			if not self.queue:
+				return self.finish(context)
+			done = len(self.results)
+		context.window_manager.progress_update(done)
+		return {'RUNNING_MODAL'}
+
+	def finish(self, context, cancelled=False):
+		context.window_manager.event_timer_remove(self.timer)
+		context.window_manager.progress_end()
+		if self.engine and cancelled:
+			self.engine.cancel()
+			self.results.extend(self.engine.results)
+		for name in self.queue:
+			self.results.append({"object": name, "filepath": "", "error": "cancelled", "skipped": False, "seconds": 0.0})
+		self.queue.clear()
+		set_selection(self.selection)
+
+		print(f"Export All: {len(self.results)} objects in {time.perf_counter()-self.start:.1f}s")
+		for result in sorted(self.results, key=lambda result: -result["seconds"]):
+			status = "failed: " + result["error"] if result["error"] else ("unchanged" if result.get("skipped") else "exported")
+			print(f"{result['seconds']:8.2f}s  {result['object']}: {status}")
+
+		failed = [result for result in self.results if result["error"]]
+		skipped = sum(1 for result in self.results if result.get("skipped") and not result["error"])
+		summary = f"{len(self.results)-len(failed)-skipped} exported, {skipped} unchanged, {len(failed)} failed."
+		if failed:
+			bpy.context.window_manager.popup_menu(
+				lambda self, ctx: [self.layout.label(text=f"{result['object']}: {result['error']}") for result in failed] , 
+				title=summary, 
+				icon='ERROR')
+		else:
+			self.report({'INFO'}, summary)
+		return {'CANCELLED'} if cancelled else {'FINISHED'}
+
 class OLI_OT_open_exported_file(bpy.types.Operator):
 	"""Open the exported file with the default viewer."""
 	bl_idname = "olitools.open_exported_file"
@@ -838,13 +1617,19 @@ class OLI_PT_export_to_directory(bpy.types.Panel):
 		box.prop(context.scene.toolchain_settings, "export_format", text="Format")
 		box.prop(context.object.toolchain_settings, "export_settings", text="Settings")
 		box.prop(context.object.toolchain_settings, "center")
+		box.prop(context.scene.toolchain_settings, "skip_unchanged")
+		box.prop(context.scene.toolchain_settings, "export_workers")
 
 		col = box.column(align=True)
 		col.scale_y = 2
+		row = col.row(align=True)
 		if len(context.selected_objects)<=1:
-			col.operator("export.to_directory", text="Export", icon="EXPORT")
+			row.operator("export.to_directory", text="Export", icon="EXPORT")
+			row.operator("export.to_directory", text="", icon="FILE_REFRESH").force = True
 		else:
-			col.operator("export.export_selected_to_directory", text="Export Selected", icon="EXPORT")
+			row.operator("export.export_selected_to_directory", text="Export Selected", icon="EXPORT")
+			row.operator("export.export_selected_to_directory", text="", icon="FILE_REFRESH").force = True
+		col.operator("export.export_all_to_directory", text="Export All", icon="EXPORT")
 
 
 		row = box.row(align=True)
@@ -876,6 +1661,7 @@ blender_classes=[
 	OLI_OT_object_export_file_path_window,
 	OLI_OT_export_to_directory,
 	OLI_OT_export_selected_to_directory,
+	OLI_OT_export_all_to_directory,
 	OLI_OT_open_explorer_to_file,
 	OLI_OT_open_exported_file,
 	OLI_OT_export_to_substance_painter,
@@ -889,12 +1675,30 @@ def register():
 		bpy.utils.register_class(blender_class)
 	bpy.types.Scene.toolchain_settings = bpy.props.PointerProperty(type = OLI_PG_export_directory_settings)
 	bpy.types.Object.toolchain_settings = bpy.props.PointerProperty(type = OLI_PG_export_object_settings)
+	bpy.app.handlers.load_post.append(invalidate_export_index_callback)
 
 def unregister():
+	if invalidate_export_index_callback in bpy.app.handlers.load_post:
+		bpy.app.handlers.load_post.remove(invalidate_export_index_callback)
 	del bpy.types.Scene.toolchain_settings
 	del bpy.types.Object.toolchain_settings
 	for blender_class in reversed(blender_classes):
 		bpy.utils.unregister_class(blender_class)
 
-if __name__ == "__main__":
+def main(argv):
+	"""Entry point of the export workers:
+	blender -b snapshot.blend --python rapid_gamedev_toolchain.py -- --jobs jobs.json --results results.json [--claims folder]
+	"""
+	parser = argparse.ArgumentParser(prog="blender -b <file> --python rapid_gamedev_toolchain.py --")
+	parser.add_argument("--jobs", required=True, help="Json file of export jobs")
+	parser.add_argument("--results", required=True, help="Json file the results are written to")
+	parser.add_argument("--claims", help="Folder of claim files shared with the other workers")
+	args = parser.parse_args(argv)
+	return run_export_jobs(args.jobs, args.results, args.claims)
+
+if __name__ == "__main__" and bpy.app.background and "--" in sys.argv:
+	register()
+	sys.exit(main(sys.argv[sys.argv.index("--")+1:]))
+
+elif __name__ == "__main__":
 	register()
\ No newline at end of file
@@ -0,0 +1,58 @@
+# -------------------------------------------------------------
+# Export fingerprint tests, need blender:
+# blender -b --factory-startup --python tests/test_fingerprint.py
+# -------------------------------------------------------------
+
+import importlib.util
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import bpy
+
+spec = importlib.util.spec_from_file_location("rapid_gamedev_toolchain", Path(__file__).resolve().parents[1] / "rapid_gamedev_toolchain.py")
+rgt = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(rgt)
+
+def fingerprint(obj_name):
+	file_format = rgt.export_format.existing_formats["FBX"]
+	obj = bpy.data.objects[obj_name]
+	return rgt.get_export_fingerprint(obj, rgt.get_export_objects(obj), file_format, file_format.get_default_settings())
+
+class TestExportFingerprint(unittest.TestCase):
+
+	def setUp(self):
+		bpy.ops.wm.read_factory_settings(use_empty=True)
+		bpy.ops.mesh.primitive_cube_add()
+		obj = bpy.context.active_object
+		obj.name = "Crate"
+		obj.vertex_groups.new(name="Lid").add([0, 1], 0.5, 'REPLACE')
+		obj.modifiers.new("Bevel", 'BEVEL')
+		mat = bpy.data.materials.new("Crate")
+		mat.use_nodes = True
+		mat.node_tree.nodes.new("ShaderNodeTexImage").image = bpy.data.images.new("Crate_albedo", 4, 4)
+		obj.data.materials.append(mat)
+
+	def test_same_after_reload(self):
+		before = fingerprint("Crate")
+		with tempfile.TemporaryDirectory() as temp_dir:
+			filepath = str(Path(temp_dir) / "fingerprint.blend")
+			bpy.ops.wm.save_as_mainfile(filepath=filepath)
+			bpy.ops.wm.open_mainfile(filepath=filepath)
+			self.assertEqual(before, fingerprint("Crate"))
+
+	def test_material_change(self):
+		before = fingerprint("Crate")
+		bsdf = bpy.data.materials["Crate"].node_tree.nodes["Principled BSDF"]
+		bsdf.inputs["Roughness"].default_value = 0.123
+		self.assertNotEqual(before, fingerprint("Crate"))
+
+	def test_weight_change(self):
+		before = fingerprint("Crate")
+		bpy.data.objects["Crate"].vertex_groups["Lid"].add([0], 1.0, 'REPLACE')
+		self.assertNotEqual(before, fingerprint("Crate"))
+
+if __name__ == "__main__":
+	result = unittest.main(argv=[sys.argv[0]], exit=False).result
+	sys.exit(0 if result.wasSuccessful() else 1)